@@ -0,0 +1,287 @@
+# Standard Library
+import json
+import os
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class FakeService:
+    """Local stand-in of an upstream service, served in a thread."""
+
+    def __init__(self):
+        """Initialize local stand-in, on a free port of the loopback."""
+        service = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                service.handle(self, "GET")
+
+            def do_HEAD(self) -> None:
+                service.handle(self, "HEAD")
+
+            def do_POST(self) -> None:
+                service.handle(self, "POST")
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), RequestHandler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base URL of the service."""
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self) -> "FakeService":
+        """Start serving in a background thread."""
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        """Answer a request."""
+        raise NotImplementedError
+
+    @staticmethod
+    def respond_json(
+        request: BaseHTTPRequestHandler,
+        data: dict,
+        status: int = 200,
+        headers: Optional[dict] = None,
+    ) -> None:
+        body = json.dumps(data).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(body)
+
+
+class FakeOverseerr(FakeService):
+    """Overseerr stand-in, serving approved movie requests."""
+
+    def __init__(self, movies: list[dict]):
+        """Initialize Overseerr stand-in.
+
+        Args:
+            movies: Movies requested, with their tmdb_id, title and
+                release_date.
+        """
+        super().__init__()
+        self.movies = {movie["tmdb_id"]: movie for movie in movies}
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        url = urlparse(request.path)
+        if url.path == "/api/v1/auth/me":
+            self.respond_json(request, {"id": 1})
+        elif url.path == "/api/v1/request":
+            query = parse_qs(url.query)
+            take = int(query.get("take", ["20"])[0])
+            skip = int(query.get("skip", ["0"])[0])
+            results = [
+                {
+                    "id": tmdb_id,
+                    "type": "movie",
+                    "updatedAt": "2020-01-01T00:00:00.000Z",
+                    "media": {"tmdbId": tmdb_id, "mediaType": "movie"},
+                }
+                for tmdb_id in self.movies
+            ]
+            self.respond_json(
+                request,
+                {
+                    "pageInfo": {
+                        "pages": max(1, -(-len(results) // take)),
+                        "page": skip // take + 1,
+                        "results": len(results),
+                    },
+                    "results": results[skip : skip + take],
+                },
+            )
+        elif (match := re.fullmatch(r"/api/v1/movie/(\d+)", url.path)) and int(
+            match.group(1)
+        ) in self.movies:
+            movie = self.movies[int(match.group(1))]
+            self.respond_json(
+                request,
+                {
+                    "id": movie["tmdb_id"],
+                    "title": movie["title"],
+                    "originalTitle": movie["title"],
+                    "releaseDate": movie["release_date"],
+                },
+            )
+        else:
+            self.respond_json(request, {"message": "Not found."}, 404)
+
+
+class FakeXthor(FakeService):
+    """Xthor stand-in, returning one release per movie."""
+
+    def __init__(self, releases: dict[int, dict]):
+        """Initialize Xthor stand-in.
+
+        Args:
+            releases: Release of every TMDB id, with its name, size and
+                download_link.
+        """
+        super().__init__()
+        self.releases = releases
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        query = parse_qs(urlparse(request.path).query)
+        tmdb_id = int(query.get("tmdbid", ["0"])[0])
+        release = self.releases.get(tmdb_id)
+        self.respond_json(
+            request,
+            {
+                "error": {"code": 0},
+                "torrents": (
+                    [{"seeders": 50, "times_completed": 200, **release}]
+                    if release
+                    else []
+                ),
+            },
+        )
+
+
+class FakeTransmission(FakeService):
+    """Transmission RPC stand-in, every torrent is complete once added."""
+
+    SESSION_ID = "benchmark"
+
+    def __init__(self, files: dict[str, tuple[str, int]]):
+        """Initialize Transmission RPC stand-in.
+
+        Args:
+            files: File name and size of every torrent link.
+        """
+        super().__init__()
+        self.files = files
+        self.torrents: dict[int, dict] = {}
+        self.lock = Lock()
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        query = json.loads(request.rfile.read(length) or b"{}")
+        if request.headers.get("X-Transmission-Session-Id") != self.SESSION_ID:
+            self.respond_json(
+                request,
+                {},
+                409,
+                {"X-Transmission-Session-Id": self.SESSION_ID},
+            )
+            return
+
+        arguments = query.get("arguments", {})
+        if query.get("method") == "session-get":
+            result = {
+                "version": "4.0.5",
+                "rpc-version": 17,
+                "rpc-version-semver": "5.3.0",
+                "rpc-version-minimum": 14,
+            }
+        elif query.get("method") == "torrent-add":
+            name, size = self.files[arguments["filename"]]
+            with self.lock:
+                torrent_id = len(self.torrents) + 1
+                self.torrents[torrent_id] = {
+                    "id": torrent_id,
+                    "name": name,
+                    "hashString": f"{torrent_id:040x}",
+                    "percentDone": 1.0,
+                    "files": [
+                        {"name": name, "length": size, "bytesCompleted": size}
+                    ],
+                    "priorities": [0],
+                    "wanted": [1],
+                }
+            result = {
+                "torrent-added": {
+                    key: self.torrents[torrent_id][key]
+                    for key in ("id", "name", "hashString")
+                }
+            }
+        elif query.get("method") == "torrent-get":
+            ids = arguments.get("ids") or list(self.torrents)
+            fields = arguments.get("fields") or []
+            result = {
+                "torrents": [
+                    {
+                        key: value
+                        for key, value in self.torrents[torrent_id].items()
+                        if not fields or key in fields or key == "id"
+                    }
+                    for torrent_id in ids
+                    if torrent_id in self.torrents
+                ]
+            }
+        else:
+            result = {}
+
+        self.respond_json(
+            request,
+            {"result": "success", "arguments": result},
+            headers={"X-Transmission-Session-Id": self.SESSION_ID},
+        )
+
+
+class FakeNginx(FakeService):
+    """nginx stand-in, serving a directory with byte range support."""
+
+    def __init__(self, root: str):
+        """Initialize nginx stand-in.
+
+        Args:
+            root: Served directory.
+        """
+        super().__init__()
+        self.root = root
+
+    def handle(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        path = os.path.join(
+            self.root, os.path.basename(unquote(urlparse(request.path).path))
+        )
+        if not os.path.isfile(path):
+            self.respond_json(request, {}, 404)
+            return
+
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        if match := re.fullmatch(
+            r"bytes=(\d+)-(\d*)", request.headers.get("Range", "")
+        ):
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            status = 206
+
+        request.send_response(status)
+        request.send_header("Accept-Ranges", "bytes")
+        request.send_header("Content-Length", str(end - start + 1))
+        if status == 206:
+            request.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        request.end_headers()
+        if method == "HEAD":
+            return
+
+        with open(path, "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and (
+                data := file.read(min(remaining, 1024 * 1024))
+            ):
+                request.wfile.write(data)
+                remaining -= len(data)
@@ -0,0 +1,91 @@
+# Standard Library
+import os
+import subprocess
+from dataclasses import dataclass
+
+# ffmpeg encoders of the synthetic sources.
+ENCODERS = {"h264": "libx264", "hevc": "libx265", "mpeg4": "mpeg4"}
+
+
+@dataclass
+class Case:
+    """Synthetic movie of the benchmark."""
+
+    name: str
+    width: int
+    height: int
+    duration: int
+    codec: str
+
+    @property
+    def file_name(self) -> str:
+        """Name of the source file, as released."""
+        return f"{self.name}.2020.MULTi.{self.height}p.{self.codec}.mkv"
+
+
+# Default cases, a few sizes and codecs.
+CASES = [
+    Case("Benchmark SD", 640, 360, 20, "mpeg4"),
+    Case("Benchmark HD", 1280, 720, 20, "h264"),
+    Case("Benchmark FHD", 1920, 1080, 20, "h264"),
+    Case("Benchmark HEVC", 1920, 1080, 20, "hevc"),
+]
+
+
+def generate(case: Case, directory: str) -> str:
+    """Generate the synthetic source of a case, if not already generated.
+
+    The video is a moving test pattern with noise, so that the encoder
+    has real work to do, and the audio a stereo tone.
+
+    Args:
+        case: Benchmark case.
+        directory: Directory of the sources.
+
+    Returns:
+        Path of the source.
+    """
+    path = os.path.join(directory, case.file_name)
+    if os.path.exists(path):
+        return path
+
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={case.width}x{case.height}:rate=24,"
+            "noise=alls=12:allf=t",
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=440:sample_rate=48000",
+            "-t",
+            str(case.duration),
+            "-map",
+            "0:v",
+            "-map",
+            "1:a",
+            "-c:v",
+            ENCODERS[case.codec],
+            "-b:v",
+            f"{case.width * case.height * 24 // 100}",
+            "-c:a",
+            "aac",
+            "-ac",
+            "2",
+            "-f",
+            "matroska",
+            f"{path}.tmp",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    os.replace(f"{path}.tmp", path)
+    return path
@@ -0,0 +1,491 @@
+"""End-to-end benchmark of the watcher and the encoder.
+
+Local stand-ins of Overseerr, Xthor, Transmission and nginx serve
+synthetic movies, the watcher and the encoder entrypoints are run against
+them in a scratch directory, and the wall time, CPU time, peak RSS and
+bytes moved of every stage are written to a JSON file, to be compared
+across commits. HandBrakeCLI, ffmpeg and ffprobe must be installed.
+
+    python -m benchmarks.run --set encoder.workers=2 --output run.json
+"""
+
+# Standard Library
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from functools import partial, wraps
+from threading import Event, Lock, Thread
+from time import monotonic, time
+from typing import Callable
+
+# First Party
+from benchmarks.fakes import (
+    FakeNginx,
+    FakeOverseerr,
+    FakeTransmission,
+    FakeXthor,
+)
+from benchmarks.media import CASES, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Timeline event and field of the bytes written by each encoder stage.
+STAGE_BYTES = {
+    "download": ("download_end", "bytes"),
+    "encode": ("encode_end", "output_size"),
+    "upload": ("transfer_end", "bytes"),
+}
+
+
+def _usage() -> dict:
+    """Get the CPU time of the process and its children."""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "cpu": own.ru_utime + own.ru_stime,
+        "children_cpu": children.ru_utime + children.ru_stime,
+    }
+
+
+def _rss(pid: int | str = "self") -> int:
+    """Get the RSS of a process, in bytes, 0 if it exited."""
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _descendants(pid: int | str = "self") -> list[int]:
+    """Get the processes started by a process and by its children."""
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as file:
+                children += map(int, file.read().split())
+    except OSError:
+        pass
+    return [
+        descendant
+        for child in children
+        for descendant in (child, *_descendants(child))
+    ]
+
+
+class _Memory:
+    """Sample the RSS of the process and of its children in a thread.
+
+    ru_maxrss is the peak of the whole life of the process, the peak of a
+    phase or of a stage is the largest sample taken while it runs. Child
+    processes shorter than the interval may be missed, and concurrent
+    stages account for each other's children.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        """Initialize the sampler.
+
+        Args:
+            interval: Time between two samples, in seconds.
+        """
+        self.interval = interval
+        self.windows: dict[int, list[int]] = {}
+        self.lock = Lock()
+        self.stopped = Event()
+        self.thread = Thread(target=self._run, daemon=True)
+
+    def start(self) -> "_Memory":
+        """Start sampling."""
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self.stopped.set()
+        self.thread.join()
+
+    def open(self) -> list[int]:
+        """Start measuring the peaks of a phase or a stage."""
+        peaks = self._sample()
+        with self.lock:
+            self.windows[id(peaks)] = peaks
+        return peaks
+
+    def close(self, peaks: list[int]) -> dict:
+        """Stop measuring the peaks of a phase or a stage.
+
+        Returns:
+            Peak RSS of the process and of its children, in bytes.
+        """
+        self._update()
+        with self.lock:
+            del self.windows[id(peaks)]
+        return {"peak_rss": peaks[0], "children_peak_rss": peaks[1]}
+
+    @staticmethod
+    def _sample() -> list[int]:
+        return [_rss(), sum(map(_rss, _descendants()))]
+
+    def _update(self) -> None:
+        sample = self._sample()
+        with self.lock:
+            for peaks in self.windows.values():
+                peaks[:] = map(max, peaks, sample)
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self._update()
+
+
+def _phase(memory: _Memory, function: Callable[[], None]) -> dict:
+    """Run a phase and measure it."""
+    before = _usage()
+    peaks = memory.open()
+    started = monotonic()
+    function()
+    wall = monotonic() - started
+    after = _usage()
+    return {
+        "wall": wall,
+        "cpu": after["cpu"] - before["cpu"],
+        "children_cpu": after["children_cpu"] - before["children_cpu"],
+        **memory.close(peaks),
+    }
+
+
+def _instrument(
+    module: object,
+    name: str,
+    samples: list[dict],
+    memory: _Memory,
+    timeline: Callable[[int], list[dict]],
+) -> None:
+    """Measure every call of a pipeline stage of the encoder.
+
+    The CPU time of the process, including the threads started by the
+    stage, and of its children is exact with one job in the pipeline at a
+    time. Concurrent stages account for each other's CPU time, so their
+    sum exceeds the one of the phase. The bytes written by the stage are
+    the ones recorded in the timeline of the job while it runs.
+    """
+    handler = getattr(module, name)
+    event, field = STAGE_BYTES[name]
+
+    @wraps(handler)
+    def stage(*args):
+        job = args[-1]
+        before = _usage()
+        peaks = memory.open()
+        started, at = monotonic(), time()
+        try:
+            return handler(*args)
+        finally:
+            samples.append(
+                {
+                    "stage": name,
+                    "torrent_id": job.torrent.torrent_id,
+                    "wall": monotonic() - started,
+                    **{
+                        key: value - before[key]
+                        for key, value in _usage().items()
+                    },
+                    **memory.close(peaks),
+                    "bytes": sum(
+                        entry.get(field) or 0
+                        for entry in timeline(job.torrent.torrent_id)
+                        if entry["event"] == event and entry["at"] >= at
+                    ),
+                }
+            )
+
+    setattr(module, name, stage)
+
+
+def _configuration(workdir: str, services: dict, overrides: list[str]) -> dict:
+    """Build the configuration pointing to the local stand-ins."""
+    configuration = {
+        "transmission": {
+            "host": "127.0.0.1",
+            "port": int(services["transmission"].url.rsplit(":", 1)[1]),
+            "username": "benchmark",
+            "password": "benchmark",
+        },
+        "nginx": {"host": services["nginx"].url},
+        "overseerr": {
+            "host": services["overseerr"].url,
+            "api_key": "benchmark",
+            "rate_limit": 1000.0,
+            "burst": 100,
+        },
+        "xthor": {
+            "api_key": "benchmark",
+            "host": f"{services['xthor'].url}/",
+            "rate_limit": 1000.0,
+            "burst": 100,
+        },
+        "juicefs_movie": {"database": "", "bucket": "movies"},
+        "storage": {"path": os.path.join(workdir, "db.sqlite3")},
+        "cache": {"path": os.path.join(workdir, "cache.sqlite3")},
+    }
+    for override in overrides:
+        key, value = override.split("=", 1)
+        *sections, field = key.split(".")
+        section = configuration
+        for name in sections:
+            section = section.setdefault(name, {})
+        try:
+            section[field] = json.loads(value)
+        except ValueError:
+            section[field] = value
+    return configuration
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(arguments: argparse.Namespace) -> dict:
+    """Run the benchmark.
+
+    Returns:
+        Results.
+    """
+    cases = [
+        case
+        for case in CASES
+        if not arguments.cases or case.name in arguments.cases
+    ]
+    workdir = arguments.workdir
+    sources = os.path.join(workdir, "nginx")
+    os.makedirs(sources, exist_ok=True)
+    os.makedirs(os.path.join(workdir, "juicefs", "movies"), exist_ok=True)
+    shutil.copytree(
+        os.path.join(ROOT, "presets"),
+        os.path.join(workdir, "presets"),
+        dirs_exist_ok=True,
+    )
+
+    files, releases, movies = {}, {}, []
+    for tmdb_id, case in enumerate(cases, start=1):
+        path = generate(case, arguments.media or sources)
+        if os.path.dirname(path) != sources:
+            shutil.copy(path, sources)
+        link = f"benchmark://{tmdb_id}"
+        files[link] = (case.file_name, os.path.getsize(path))
+        releases[tmdb_id] = {
+            "name": case.file_name,
+            "size": os.path.getsize(path),
+            "download_link": link,
+        }
+        movies.append(
+            {
+                "tmdb_id": tmdb_id,
+                "title": case.name,
+                "release_date": "2020-01-01",
+            }
+        )
+
+    services = {
+        "overseerr": FakeOverseerr(movies).start(),
+        "xthor": FakeXthor(releases).start(),
+        "transmission": FakeTransmission(files).start(),
+        "nginx": FakeNginx(sources).start(),
+    }
+    with open(os.path.join(workdir, "config.json"), "w") as file:
+        json.dump(
+            _configuration(workdir, services, arguments.set), file, indent=4
+        )
+
+    # The service accessors read config.json from the cwd on first use.
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    # Third Party
+    from loguru import logger
+
+    # First Party
+    from overloaadd import db, encoder, metrics, watcher
+    from overloaadd.dataclasses import Torrent
+    from overloaadd.stats import percentile, summarize
+
+    logger.remove()
+    logger.add(sys.stderr, level=arguments.log_level)
+
+    def timeline(torrent_id: int) -> list[dict]:
+        return (db.get(torrent_id) or {}).get("timeline", [])
+
+    memory = _Memory().start()
+    samples = []
+    for name in STAGE_BYTES:
+        _instrument(encoder, name, samples, memory, timeline)
+
+    phases = {
+        "watcher": _phase(memory, watcher.entrypoint),
+        "encoder": _phase(memory, partial(encoder.entrypoint, once=True)),
+    }
+    memory.stop()
+    for service in services.values():
+        service.stop()
+
+    rows = {
+        row["tmdb_id"]: row
+        for status in Torrent.TorrentStatus
+        for row in db.search(status)
+    }
+    results = []
+    for tmdb_id, case in enumerate(cases, start=1):
+        row = rows.get(tmdb_id, {})
+        summary = summarize(row.get("timeline", []))
+        results.append(
+            {
+                "name": case.name,
+                "codec": case.codec,
+                "resolution": f"{case.width}x{case.height}",
+                "duration": case.duration,
+                "status": row.get("status"),
+                "mode": summary.get("mode"),
+                "source_bytes": files[f"benchmark://{tmdb_id}"][1],
+                "output_bytes": summary.get("output_size"),
+                "durations": summary["durations"],
+                "stages": {
+                    sample["stage"]: {
+                        key: sample[key]
+                        for key in (
+                            "wall",
+                            "cpu",
+                            "children_cpu",
+                            "peak_rss",
+                            "children_peak_rss",
+                            "bytes",
+                        )
+                    }
+                    for sample in samples
+                    if sample["torrent_id"] == row.get("torrent_id")
+                },
+            }
+        )
+
+    stages = {}
+    for name in STAGE_BYTES:
+        runs = [sample for sample in samples if sample["stage"] == name]
+        walls = [sample["wall"] for sample in runs]
+        stages[name] = {
+            "count": len(walls),
+            "wall_total": sum(walls),
+            "wall_p50": percentile(walls, 50),
+            "wall_p95": percentile(walls, 95),
+            "cpu_total": sum(
+                sample["cpu"] + sample["children_cpu"] for sample in runs
+            ),
+            "peak_rss": max(
+                (sample["peak_rss"] for sample in runs), default=0
+            ),
+            "children_peak_rss": max(
+                (sample["children_peak_rss"] for sample in runs), default=0
+            ),
+            "bytes_total": sum(sample["bytes"] for sample in runs),
+        }
+
+    return {
+        "commit": _commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cpus": len(os.sched_getaffinity(0)),
+        "settings": arguments.set,
+        "phases": phases,
+        "stages": stages,
+        "bytes": {
+            "downloaded": sum(
+                value for _, _, value in metrics.download_bytes.samples()
+            ),
+            "transferred": sum(
+                result["output_bytes"] or 0 for result in results
+            ),
+        },
+        "cases": results,
+    }
+
+
+def main() -> None:
+    """Benchmark entrypoint."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--case",
+        dest="cases",
+        action="append",
+        default=[],
+        help="Name of a case to run, every case by default.",
+    )
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="SECTION.FIELD=VALUE",
+        help="Configuration override, e.g. encoder.workers=2.",
+    )
+    parser.add_argument(
+        "--media", help="Directory caching the generated sources."
+    )
+    parser.add_argument("--workdir", help="Scratch directory, kept.")
+    parser.add_argument(
+        "--output",
+        default=os.path.join(
+            ROOT,
+            "benchmarks",
+            "results",
+            f"{datetime.now():%Y%m%d-%H%M%S}.json",
+        ),
+        help="Path of the JSON results.",
+    )
+    parser.add_argument("--log-level", default="WARNING")
+    arguments = parser.parse_args()
+
+    # Relative to the caller, the benchmark changes directory.
+    arguments.output = os.path.abspath(arguments.output)
+    if arguments.media:
+        arguments.media = os.path.abspath(arguments.media)
+        os.makedirs(arguments.media, exist_ok=True)
+    # Scratch directories are removed, a given one is kept to inspect it.
+    scratch = arguments.workdir is None
+    if scratch:
+        arguments.workdir = tempfile.mkdtemp(prefix="overloaadd-")
+    else:
+        arguments.workdir = os.path.abspath(arguments.workdir)
+        os.makedirs(arguments.workdir, exist_ok=True)
+    try:
+        results = run(arguments)
+    finally:
+        os.chdir(ROOT)
+        if scratch:
+            shutil.rmtree(arguments.workdir, ignore_errors=True)
+
+    os.makedirs(os.path.dirname(arguments.output), exist_ok=True)
+    with open(arguments.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(json.dumps(results["phases"], indent=4))
+    print(f"Results written to {arguments.output}.")
+
+    if any(case["status"] != "done" for case in results["cases"]):
+        print("Some cases did not finish.", file=sys.stderr)
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
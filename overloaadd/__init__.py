@@ -1,27 +1,152 @@
-# Third Party
-from tinydb import TinyDB
+# Standard Library
+import os
+from functools import lru_cache, wraps
+from threading import RLock
+from typing import Any, Callable, TypeVar
 
 # First Party
-from overloaadd.handlers import Overseerr, Transmission, Xthor
-from overloaadd.helpers import load_configuration
 from overloaadd.logger import logger
 
-db = TinyDB("db.json")
-
-configuration = load_configuration(logger)
-transmission = Transmission(
-    logger=logger,
-    host=configuration.transmission.host,
-    port=configuration.transmission.port,
-    username=configuration.transmission.username,
-    password=configuration.transmission.password,
-)
-overseerr = Overseerr(
-    logger=logger,
-    host=configuration.overseerr.host,
-    api_key=configuration.overseerr.api_key,
-)
-xthor = Xthor(
-    logger=logger,
-    api_key=configuration.xthor.api_key,
-)
+T = TypeVar("T")
+
+# Services are built on first use, each process only pays for the ones it
+# needs. The lock is reentrant as services depend on each other.
+_lock = RLock()
+
+
+def _service(factory: Callable[[], T]) -> Callable[[], T]:
+    """Build a service once, on first use, safely between threads."""
+    factory = lru_cache(maxsize=None)(factory)
+
+    @wraps(factory)
+    def accessor() -> T:
+        with _lock:
+            return factory()
+
+    accessor.cache_clear = factory.cache_clear
+    return accessor
+
+
+@_service
+def get_configuration():
+    """Get the configuration, loaded from config.json."""
+    # First Party
+    from overloaadd.helpers import load_configuration
+
+    return load_configuration(logger)
+
+
+@_service
+def get_db():
+    """Get the job store."""
+    # First Party
+    from overloaadd.storage import open_storage
+
+    return open_storage(logger, get_configuration().storage)
+
+
+@_service
+def get_cache():
+    """Get the cache of the upstream APIs."""
+    # First Party
+    from overloaadd.cache import Cache
+
+    return Cache(get_configuration().cache.path)
+
+
+@_service
+def get_scratch():
+    """Get the scratch space of the encoder jobs."""
+    # First Party
+    from overloaadd.scratch import Scratch
+
+    configuration = get_configuration()
+    return Scratch(
+        logger,
+        os.path.join(os.getcwd(), configuration.scratch.path),
+        configuration.scratch.min_free,
+        configuration.scratch.output_ratio,
+        configuration.scratch.max_age,
+    )
+
+
+@_service
+def get_transmission():
+    """Get the Transmission service."""
+    # First Party
+    from overloaadd.handlers.transmission import Transmission
+
+    configuration = get_configuration()
+    return Transmission(
+        logger=logger,
+        host=configuration.transmission.host,
+        port=configuration.transmission.port,
+        username=configuration.transmission.username,
+        password=configuration.transmission.password,
+        http=configuration.http,
+        health_interval=configuration.transmission.health_interval,
+    )
+
+
+@_service
+def get_overseerr():
+    """Get the Overseerr service."""
+    # First Party
+    from overloaadd.client import create_session
+    from overloaadd.handlers.overseerr import Overseerr
+    from overloaadd.ratelimit import RateLimiter
+
+    configuration = get_configuration()
+    return Overseerr(
+        logger=logger,
+        host=configuration.overseerr.host,
+        api_key=configuration.overseerr.api_key,
+        rate_limiter=RateLimiter(
+            configuration.overseerr.rate_limit, configuration.overseerr.burst
+        ),
+        cache=get_cache(),
+        session=create_session(configuration.http),
+        cache_ttl=configuration.cache.overseerr_ttl,
+    )
+
+
+@_service
+def get_xthor():
+    """Get the Xthor service."""
+    # First Party
+    from overloaadd.client import create_session
+    from overloaadd.handlers.xthor import Xthor
+    from overloaadd.ratelimit import RateLimiter
+
+    configuration = get_configuration()
+    return Xthor(
+        logger=logger,
+        api_key=configuration.xthor.api_key,
+        host=configuration.xthor.host,
+        rate_limiter=RateLimiter(
+            configuration.xthor.rate_limit, configuration.xthor.burst
+        ),
+        cache=get_cache(),
+        session=create_session(configuration.http),
+        cache_ttl=configuration.cache.xthor_ttl,
+        negative_ttl=configuration.cache.negative_ttl,
+        negative_max_ttl=configuration.cache.negative_max_ttl,
+        ranking=configuration.xthor.ranking,
+    )
+
+
+# Module attributes kept for compatibility, e.g. from overloaadd import db.
+_SERVICES = {
+    "configuration": get_configuration,
+    "db": get_db,
+    "cache": get_cache,
+    "transmission": get_transmission,
+    "overseerr": get_overseerr,
+    "xthor": get_xthor,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SERVICES:
+        return _SERVICES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,103 @@
+# Standard Library
+import json
+import sqlite3
+from threading import Lock
+from time import time
+from typing import Any
+
+
+class Cache:
+    """Persistent TTL cache class, backed by SQLite."""
+
+    def __init__(self, path: str):
+        """Initialize cache.
+
+        Args:
+            path: Path of the cache database.
+        """
+        self.path = path
+        self.lock = Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT, "
+                "expires_at REAL NOT NULL, "
+                "misses INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def lookup(self, key: str) -> tuple[bool, Any]:
+        """Look up a key.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            Whether the key is cached and not expired, and its value.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?",
+                (key, time()),
+            ).fetchone()
+
+        if row is None:
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """Cache a value.
+
+        Args:
+            key: Cache key.
+            value: JSON serializable value.
+            ttl: Time to live, in seconds.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache "
+                "(key, value, expires_at, misses) "
+                "VALUES (?, ?, ?, 0)",
+                (key, json.dumps(value), time() + ttl),
+            )
+
+    def miss(self, key: str, ttl: float, max_ttl: float) -> float:
+        """Cache a negative result, doubling its TTL on every miss.
+
+        Args:
+            key: Cache key.
+            ttl: Time to live of the first miss, in seconds.
+            max_ttl: Maximum time to live, in seconds.
+
+        Returns:
+            Time to live of the negative result, in seconds.
+        """
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT misses FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            misses = row[0] if row is not None else 0
+            ttl = min(ttl * 2**misses, max_ttl)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO cache "
+                "(key, value, expires_at, misses) "
+                "VALUES (?, 'null', ?, ?)",
+                (key, time() + ttl, misses + 1),
+            )
+
+        return ttl
+
+    def purge(self, keep_misses: float = 0) -> None:
+        """Remove the expired entries.
+
+        Args:
+            keep_misses: Time, in seconds, during which expired negative
+                results are kept to remember their miss count.
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM cache WHERE "
+                "(misses = 0 AND expires_at <= ?) OR expires_at <= ?",
+                (time(), time() - keep_misses),
+            )
@@ -0,0 +1,103 @@
+# Standard Library
+from typing import Optional
+
+# Third Party
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# First Party
+from overloaadd.dataclasses import HTTPConfiguration
+
+# Transient statuses retried with backoff.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter class applying a default timeout to every request."""
+
+    def __init__(self, timeout: tuple[float, float], *args, **kwargs):
+        """Initialize HTTP adapter.
+
+        Args:
+            timeout: Connect and read timeouts, in seconds.
+        """
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def retry(
+    configuration: HTTPConfiguration, methods: Optional[list[str]] = None
+) -> Retry:
+    """Build the retry policy, exponential with jitter.
+
+    Args:
+        configuration: HTTP configuration.
+        methods: Retried methods, the idempotent ones by default.
+
+    Returns:
+        Retry policy.
+    """
+    return Retry(
+        total=configuration.retries,
+        connect=configuration.retries,
+        read=configuration.retries,
+        status=configuration.retries,
+        backoff_factor=configuration.backoff_factor,
+        backoff_jitter=configuration.backoff_jitter,
+        backoff_max=configuration.backoff_max,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=(
+            frozenset(methods) if methods else Retry.DEFAULT_ALLOWED_METHODS
+        ),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def mount(
+    session: requests.Session,
+    configuration: HTTPConfiguration,
+    methods: Optional[list[str]] = None,
+) -> requests.Session:
+    """Mount the pooled, retrying adapter with timeouts on a session.
+
+    Args:
+        session: Session to tune.
+        configuration: HTTP configuration.
+        methods: Retried methods, the idempotent ones by default.
+
+    Returns:
+        The session.
+    """
+    adapter = TimeoutHTTPAdapter(
+        (configuration.connect_timeout, configuration.read_timeout),
+        pool_connections=configuration.pool_connections,
+        pool_maxsize=configuration.pool_maxsize,
+        max_retries=retry(configuration, methods),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def create_session(
+    configuration: HTTPConfiguration, headers: Optional[dict] = None
+) -> requests.Session:
+    """Create a pooled, retrying session with timeouts.
+
+    Args:
+        configuration: HTTP configuration.
+        headers: Headers sent with every request.
+
+    Returns:
+        Session.
+    """
+    session = mount(requests.Session(), configuration)
+    session.headers.update(headers or {})
+    return session
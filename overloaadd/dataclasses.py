@@ -1,5 +1,6 @@
 # Standard Library
 from enum import Enum
+from typing import Literal
 
 # Third Party
 from pydantic import BaseModel, HttpUrl
@@ -12,6 +13,7 @@ class TransmissionConfiguration(BaseModel):
     port: int
     username: str
     password: str
+    health_interval: float = 60
 
 
 class NginxConfiguration(BaseModel):
@@ -25,12 +27,62 @@ class OverseerrConfiguration(BaseModel):
 
     host: HttpUrl
     api_key: str
+    rate_limit: float = 10.0
+    burst: int = 5
+
+
+class RankingWeightsConfiguration(BaseModel):
+    """Release ranking weights configuration dataclass."""
+
+    title: float = 2.0
+    size: float = 1.0
+    codec: float = 1.5
+    resolution: float = 1.0
+    seeders: float = 1.0
+    popularity: float = 0.5
+
+
+class RankingConfiguration(BaseModel):
+    """Release ranking configuration dataclass."""
+
+    min_similarity: float = 0.7
+    required: list[str] = ["multi"]
+    max_size: int = 40 * 1024**3
+    # Scores of the first keyword found in the release name, HEVC releases
+    # skip the transcoding.
+    codecs: dict[str, float] = {
+        "remux": 0.0,
+        "x265": 1.0,
+        "hevc": 1.0,
+        "h265": 1.0,
+        "h.265": 1.0,
+        "av1": 0.6,
+        "x264": 0.4,
+        "h264": 0.4,
+        "h.264": 0.4,
+        "avc": 0.2,
+    }
+    default_codec: float = 0.3
+    resolutions: dict[str, float] = {
+        "1080p": 1.0,
+        "2160p": 0.4,
+        "4k": 0.4,
+        "720p": 0.5,
+    }
+    default_resolution: float = 0.2
+    seeders_cap: int = 100
+    popularity_cap: int = 1000
+    weights: RankingWeightsConfiguration = RankingWeightsConfiguration()
 
 
 class XthorConfiguration(BaseModel):
     """Xthor configuration dataclass."""
 
     api_key: str
+    host: str = "https://api.xthor.tk"
+    rate_limit: float = 0.4
+    burst: int = 1
+    ranking: RankingConfiguration = RankingConfiguration()
 
 
 class JuiceFSConfiguration(BaseModel):
@@ -40,6 +92,125 @@ class JuiceFSConfiguration(BaseModel):
     bucket: str
 
 
+# SQLite journal modes, the others would lose data or the cross-process lock.
+JournalMode = Literal["wal", "delete", "truncate", "persist"]
+
+
+class StorageConfiguration(BaseModel):
+    """Storage configuration dataclass."""
+
+    backend: Literal["sqlite", "tinydb"] = "sqlite"
+    path: str | None = None
+    migrate_from: str = "db.json"
+    journal_mode: JournalMode = "wal"
+
+
+class CacheConfiguration(BaseModel):
+    """Cache configuration dataclass."""
+
+    path: str = "cache.sqlite3"
+    overseerr_ttl: float = 86400
+    xthor_ttl: float = 3600
+    negative_ttl: float = 900
+    negative_max_ttl: float = 86400
+
+
+class WatcherConfiguration(BaseModel):
+    """Watcher configuration dataclass."""
+
+    workers: int = 8
+    page_size: int = 100
+    incremental: bool = True
+    full_scan_interval: float = 3600
+
+
+class DownloadConfiguration(BaseModel):
+    """Download configuration dataclass."""
+
+    chunk_size: int = 64 * 1024 * 1024
+    connections: int = 4
+
+
+class ScratchConfiguration(BaseModel):
+    """Scratch space configuration dataclass."""
+
+    path: str = "medias"
+    min_free: int = 1024 * 1024 * 1024
+    output_ratio: float = 0.6
+    max_age: float = 7 * 86400
+
+
+class EncoderConfiguration(BaseModel):
+    """Encoder configuration dataclass."""
+
+    workers: int = 1
+    threads_per_job: int | None = None
+    download_workers: int = 1
+    upload_workers: int = 1
+    queue_size: int = 1
+    streaming: bool = False
+    max_bit_rate: int | None = None
+    segments: int = 1
+    segment_min_duration: float = 1200
+    renditions: str | None = None
+    worker_id: str | None = None
+    lease_duration: float = 300
+    heartbeat_interval: float = 60
+    max_attempts: int = 3
+    retry_backoff: float = 60
+
+
+class EventsConfiguration(BaseModel):
+    """Encoder events configuration dataclass."""
+
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 8787
+    url: str = "http://127.0.0.1:8787"
+    token: str | None = None
+    poll_interval: float = 300
+
+
+class WebhookConfiguration(BaseModel):
+    """Overseerr webhook configuration dataclass."""
+
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    port: int = 8788
+    token: str | None = None
+    poll_interval: float = 900
+
+
+class TransferConfiguration(BaseModel):
+    """Transfer configuration dataclass."""
+
+    buffer_size: int = 16 * 1024 * 1024
+    verify: bool = True
+    direct_output: bool = False
+
+
+class MetricsConfiguration(BaseModel):
+    """Prometheus metrics endpoint configuration dataclass."""
+
+    enabled: bool = False
+    host: str = "0.0.0.0"
+    watcher_port: int = 9101
+    encoder_port: int = 9102
+
+
+class HTTPConfiguration(BaseModel):
+    """Upstream HTTP clients configuration dataclass."""
+
+    connect_timeout: float = 5
+    read_timeout: float = 30
+    retries: int = 3
+    backoff_factor: float = 0.5
+    backoff_jitter: float = 0.5
+    backoff_max: float = 30
+    pool_connections: int = 4
+    pool_maxsize: int = 16
+
+
 class IrilisConfiguration(BaseModel):
     """Irilis configuration dataclass."""
 
@@ -48,6 +219,17 @@ class IrilisConfiguration(BaseModel):
     overseerr: OverseerrConfiguration
     xthor: XthorConfiguration
     juicefs_movie: JuiceFSConfiguration
+    storage: StorageConfiguration = StorageConfiguration()
+    cache: CacheConfiguration = CacheConfiguration()
+    watcher: WatcherConfiguration = WatcherConfiguration()
+    download: DownloadConfiguration = DownloadConfiguration()
+    encoder: EncoderConfiguration = EncoderConfiguration()
+    scratch: ScratchConfiguration = ScratchConfiguration()
+    transfer: TransferConfiguration = TransferConfiguration()
+    events: EventsConfiguration = EventsConfiguration()
+    webhook: WebhookConfiguration = WebhookConfiguration()
+    metrics: MetricsConfiguration = MetricsConfiguration()
+    http: HTTPConfiguration = HTTPConfiguration()
 
 
 class Torrent(BaseModel):
@@ -59,9 +241,45 @@ class Torrent(BaseModel):
         DOWNLOADING = "downloading"
         ENCODING = "encoding"
         DONE = "done"
+        FAILED = "failed"
 
     torrent_id: int
     tmdb_id: int
     title: str
     year: int | None
     status: TorrentStatus = TorrentStatus.DOWNLOADING
+
+
+class Job(BaseModel):
+    """Encoder job dataclass."""
+
+    torrent: Torrent
+    source_url: str
+    medias: str
+    source_size: int | None = None
+    source_file: str | None = None
+    source_hash: str | None = None
+    output_files: list[str] = []
+    checkpoints: dict = {}
+
+
+class AudioStream(BaseModel):
+    """Audio stream dataclass."""
+
+    codec: str | None = None
+    channels: int | None = None
+    channel_layout: str | None = None
+    language: str | None = None
+
+
+class MediaInfo(BaseModel):
+    """Media information dataclass."""
+
+    container: str | None = None
+    duration: float | None = None
+    bit_rate: int | None = None
+    video_codec: str | None = None
+    width: int | None = None
+    height: int | None = None
+    video_bit_rate: int | None = None
+    audio: list[AudioStream] = []
@@ -1,91 +1,627 @@
 # Standard Library
+import hashlib
+import json
 import os
-import shutil
-
-# Third Party
-from tinydb import Query
-from tinydb.table import Table
+import socket
+import subprocess
+from functools import lru_cache, partial
+from queue import Queue
+from threading import Event, Lock, Thread
+from time import sleep, time
+from typing import TYPE_CHECKING, Iterator, Optional
+from urllib.parse import quote
 
 # First Party
-from overloaadd import configuration, db, transmission
-from overloaadd.dataclasses import Torrent
+from overloaadd import get_configuration, get_db, get_scratch, get_transmission
+from overloaadd.dataclasses import Job, MediaInfo, Torrent
 from overloaadd.helpers import (
-    clean_medias,
+    cpu_sets,
     download_file,
     encode_file,
-    is_already_encoded,
+    encode_file_renditions,
+    encode_file_segmented,
+    file_fingerprint,
+    is_streamable,
+    load_preset,
+    load_renditions,
     mount_juicefs,
+    needs_transcode,
+    probe_file,
+    remux_file,
     setup_handbrake,
+    stream_encode_file,
+    transfer_file,
 )
 from overloaadd.logger import logger
+from overloaadd.pipeline import Pipeline, Stage
+from overloaadd.server import Server
+
+if TYPE_CHECKING:
+    # Third Party
+    from transmission_rpc import Torrent as TransmissionTorrent
+
+# Torrents fed to the pipeline, waiting to be leased.
+queued = set()
+# Torrents leased by this encoder, kept alive by the heartbeat.
+leases = set()
+# Torrents whose lease expired and may be claimed by another encoder.
+lost = set()
+leases_lock = Lock()
+
+# Completed stages persisted with a job, in order, a restarted job resumes
+# after the last one whose file is unchanged.
+CHECKPOINTS = ("downloaded", "probed", "encoded", "transferred")
+
+
+@lru_cache(maxsize=None)
+def worker_id() -> str:
+    """Get the identifier of this encoder in the job leases."""
+    return (
+        get_configuration().encoder.worker_id
+        or f"{socket.gethostname()}:{os.getpid()}"
+    )
+
 
+def prepare(
+    logger: logger, torrent: dict, transmission_torrent: "TransmissionTorrent"
+) -> Optional[Job]:
+    """Create the job of a torrent, if it is ready to be processed."""
+    configuration = get_configuration()
+    if transmission_torrent.progress != 100:
+        return None
 
-def process(logger: logger, torrents: Table, torrent: dict) -> None:
-    """Process torrent."""
-    TorrentQuery = Query()
+    # Get the biggest file.
+    file = max(transmission_torrent.get_files(), key=lambda file: file.size)
 
-    transmission_torrent = transmission.get_torrent(torrent["torrent_id"])
+    return Job(
+        torrent=Torrent.model_validate(torrent),
+        source_url=(
+            f"{configuration.nginx.host.rstrip('/')}/{quote(file.name)}"
+        ),
+        medias=get_scratch().path(torrent["torrent_id"]),
+        source_size=file.size,
+        checkpoints=torrent.get("checkpoints") or {},
+    )
+
+
+def download(logger: logger, job: Job) -> Optional[Job]:
+    """Download stage."""
+    configuration = get_configuration()
+    title = job.torrent.title
 
-    title = torrent.get("title")
-    year = torrent.get("year")
-    tmdb_id = torrent.get("tmdb_id")
+    logger.info(f"Processing {title}.")
+    # Admit the job in the scratch space before leasing it, a job waiting
+    # for room is not an attempt. The medias of an interrupted job are
+    # kept, the download resumes from them.
+    if get_scratch().reserve(job.torrent.torrent_id, job.source_size) is None:
+        logger.warning(f"Postponing {title}, not enough scratch space.")
+        with leases_lock:
+            queued.discard(job.torrent.torrent_id)
+        return None
 
-    if transmission_torrent.progress == 100:
-        logger.info(f"Processing {title}.")
-        # Set torrent status to encoding.
-        torrents.update(
-            {"status": Torrent.TorrentStatus.ENCODING.value},
-            TorrentQuery.torrent_id == torrent["torrent_id"],
+    # Lease the torrent, setting its status to encoding.
+    if not get_db().claim(
+        job.torrent.torrent_id,
+        worker_id(),
+        configuration.encoder.lease_duration,
+    ):
+        logger.warning(f"{title} has been taken by another encoder.")
+        get_scratch().release(job.torrent.torrent_id)
+        with leases_lock:
+            queued.discard(job.torrent.torrent_id)
+        return None
+    with leases_lock:
+        queued.discard(job.torrent.torrent_id)
+        leases.add(job.torrent.torrent_id)
+    report(job, "download")
+
+    # Checksum of the source of the outputs of an earlier run, if any.
+    job.source_hash = job.checkpoints.get("downloaded", {}).get("checksum")
+    if (stage := resume(logger, job)) is not None:
+        logger.info(f"Resuming {title}, {stage}.")
+        record(job, "resume", stage=stage)
+    if {"encoded", "transferred"} & job.checkpoints.keys():
+        return job
+    if "downloaded" in job.checkpoints:
+        job.source_file = job.checkpoints["downloaded"]["files"][0]["path"]
+        return job
+
+    # Let the encode stage read the source straight from the HTTP server,
+    # the renditions are encoded from a downloaded source. Sources within
+    # the target are downloaded, to be remuxed.
+    if (
+        configuration.encoder.streaming
+        and not configuration.encoder.renditions
+        and is_streamable(logger, job.source_url, configuration.http)
+        and (media := probe_file(logger, job.source_url)) is not None
+        and needs_transcode(
+            logger,
+            media,
+            load_preset("movie"),
+            configuration.encoder.max_bit_rate,
         )
+    ):
+        logger.info(f"Streaming {title} to the encoder.")
+        return job
+
+    # Download torrent.
+    logger.info(f"Downloading {title}.")
+    record(job, "download_start")
+    job.source_file, job.source_hash = download_file(
+        logger,
+        job.source_url,
+        job.medias,
+        configuration.download.chunk_size,
+        configuration.download.connections,
+        configuration.http,
+    )
+    record(job, "download_end", bytes=os.path.getsize(job.source_file))
+    checkpoint(job, "downloaded", [job.source_file], checksum=job.source_hash)
+
+    return job
+
+
+def check_lease(job: Job) -> None:
+    """Stop a job whose lease was lost, another encoder may run it.
+
+    Raises:
+        RuntimeError: The lease of the job was lost.
+    """
+    with leases_lock:
+        if job.torrent.torrent_id in lost:
+            raise RuntimeError(f"Lease of {job.torrent.title} was lost.")
+
+
+def report(job: Job, stage: str) -> None:
+    """Record the stage a job is in."""
+    get_db().update(
+        job.torrent.torrent_id,
+        {"stage": stage, "stage_started_at": time(), "worker": worker_id()},
+    )
+
+
+def record(job: Job, event: str, **fields) -> None:
+    """Append an event to the timeline of a job."""
+    get_db().append_event(job.torrent.torrent_id, event, **fields)
 
-        clean_medias(logger)
 
-        # Download torrent.
-        logger.info(f"Downloading {title}.")
-        files = transmission_torrent.get_files()
+def checkpoint(
+    job: Job, stage: str, paths: Optional[list[str]] = None, **fields
+) -> None:
+    """Persist a completed stage of a job.
 
-        # Get the biggest file.
-        file = max(files, key=lambda file: file.size)
+    Args:
+        job: Encoder job.
+        stage: Completed stage, one of CHECKPOINTS.
+        paths: Files produced by the stage, fingerprinted.
+        fields: Results of the stage.
+    """
+    if paths is not None:
+        fields["files"] = fingerprints(paths)
+    job.checkpoints = {**job.checkpoints, stage: fields}
+    get_db().update(job.torrent.torrent_id, {"checkpoints": job.checkpoints})
 
-        downloaded_file = download_file(
-            f"{file.name}",
-            os.path.join(os.getcwd(), "medias"),
+
+def fingerprints(paths: list[str]) -> list[dict]:
+    """Fingerprint files, to check later they have not changed."""
+    return [
+        {"path": path, "fingerprint": file_fingerprint(path)} for path in paths
+    ]
+
+
+def unchanged(files: list[dict]) -> bool:
+    """Check whether fingerprinted files are unchanged."""
+    try:
+        return all(
+            file_fingerprint(file["path"]) == file["fingerprint"]
+            for file in files
         )
+    except OSError:
+        return False
+
 
-        if not is_already_encoded(logger, downloaded_file):
-            # Encode torrent.
-            logger.info(f"Encoding {title}.")
-            output_file_name = (
-                f"{title} ({year}) {{tmdb-{tmdb_id}}} [IRILIS].mkv"
+def resume(logger: logger, job: Job) -> Optional[str]:
+    """Drop the checkpoints of a job whose files changed or disappeared.
+
+    Returns:
+        Last completed stage, None if the job starts over.
+    """
+    last = None
+    for stage in CHECKPOINTS:
+        if (entry := job.checkpoints.get(stage)) is None:
+            continue
+        if not entry.get("files") or not unchanged(entry["files"]):
+            logger.warning(
+                f"Files of {job.torrent.title} changed, "
+                f"{stage} checkpoint dropped."
+            )
+            job.checkpoints = {
+                key: value
+                for key, value in job.checkpoints.items()
+                if key != stage
+            }
+            continue
+        last = stage
+    return last
+
+
+def artifact_key(job: Job) -> Optional[str]:
+    """Get the key of the outputs of a job in the index of the artifacts.
+
+    Returns:
+        Checksums of the source and of the encoding settings, None if the
+        source was not downloaded.
+    """
+    configuration = get_configuration()
+    if job.source_hash is None:
+        return None
+
+    settings = json.dumps(
+        {
+            "preset": load_preset("movie"),
+            "renditions": (
+                load_renditions(configuration.encoder.renditions)
+                if configuration.encoder.renditions
+                else None
+            ),
+            "max_bit_rate": configuration.encoder.max_bit_rate,
+        },
+        sort_keys=True,
+    )
+    return (
+        f"{job.source_hash}:{hashlib.blake2b(settings.encode()).hexdigest()}"
+    )
+
+
+def reuse(logger: logger, job: Job) -> bool:
+    """Reuse the outputs of the same source encoded with the same settings.
+
+    Returns:
+        True if the outputs were reused, the job is transferred.
+    """
+    configuration = get_configuration()
+    if (key := artifact_key(job)) is None or (
+        artifact := get_db().find_artifact(key)
+    ) is None:
+        return False
+
+    if len(artifact["files"]) != len(job.output_files) or not unchanged(
+        artifact["files"]
+    ):
+        logger.warning(f"Outputs of {key} changed, artifact dropped.")
+        get_db().remove_artifact(key)
+        return False
+
+    logger.info(f"Reusing the outputs of {key} for {job.torrent.title}.")
+    record(job, "encode_start", mode="reuse")
+    outputs = [bucket_path(output_file) for output_file in job.output_files]
+    for file, output in zip(artifact["files"], outputs):
+        if file["path"] != output:
+            # Copied, the artifact stays the output of its own movie.
+            transfer_file(
+                logger,
+                file["path"],
+                output,
+                configuration.transfer.buffer_size,
+                configuration.transfer.verify,
+                remove_source=False,
             )
+    record(job, "encode_end", output_size=sum(map(os.path.getsize, outputs)))
+    checkpoint(job, "transferred", outputs, outputs=job.output_files)
+    return True
+
+
+def source_size(job: Job) -> dict:
+    """Get the timeline field of the size of a downloaded source."""
+    return {"source_size": os.path.getsize(job.source_file)}
+
+
+def bucket_path(file_name: str) -> str:
+    """Get the path of a file in the movies bucket."""
+    configuration = get_configuration()
+    return os.path.join(
+        os.getcwd(),
+        "juicefs",
+        configuration.juicefs_movie.bucket,
+        file_name,
+    )
+
+
+def encode_path(job: Job, file_name: str) -> str:
+    """Get the path the encoder writes an output of a job to."""
+    configuration = get_configuration()
+    if configuration.transfer.direct_output:
+        # Hidden until the upload stage renames it.
+        return bucket_path(f".{file_name}.partial")
+
+    return os.path.join(job.medias, file_name)
+
+
+def select_renditions(media: Optional[MediaInfo]) -> list[dict]:
+    """Get the renditions of the profile fitting a source.
+
+    Renditions whose minimum width exceeds the width of the source are
+    skipped, only the ones without a minimum width are kept when the width
+    of the source is unknown.
+    """
+    configuration = get_configuration()
+    width = (media.width if media is not None else None) or 0
+    return [
+        rendition
+        for rendition in load_renditions(configuration.encoder.renditions)
+        if rendition["MinWidth"] <= width
+    ]
+
+
+def encode(logger: logger, cpus: Queue, job: Job) -> Job:
+    """Encode stage."""
+    configuration = get_configuration()
+    title = job.torrent.title
+    year = job.torrent.year
+    tmdb_id = job.torrent.tmdb_id
+
+    if {"encoded", "transferred"} & job.checkpoints.keys():
+        return job
+    check_lease(job)
+    report(job, "encode")
+
+    media = None
+    if "probed" in job.checkpoints:
+        media = MediaInfo.model_validate(job.checkpoints["probed"]["media"])
+    elif job.source_file is not None:
+        media = probe_file(logger, job.source_file)
+        if media is not None:
+            checkpoint(
+                job, "probed", [job.source_file], media=media.model_dump()
+            )
+            record(
+                job,
+                "probe",
+                width=media.width,
+                height=media.height,
+                duration=media.duration,
+                video_codec=media.video_codec,
+            )
+
+    name = f"{title} ({year}) {{tmdb-{tmdb_id}}} [IRILIS]"
+    renditions = []
+    if configuration.encoder.renditions and job.source_file is not None:
+        if not (renditions := select_renditions(media)):
+            logger.warning(f"No rendition fits {title}, encoding the movie.")
+    job.output_files = [
+        f"{name} - {rendition['RenditionName']}.mkv"
+        for rendition in renditions
+    ] or [f"{name}.mkv"]
+    outputs = [
+        encode_path(job, output_file) for output_file in job.output_files
+    ]
+
+    if reuse(logger, job):
+        return job
+
+    if renditions:
+        logger.info(f"Encoding {len(renditions)} rendition(s) of {title}.")
+        record(
+            job,
+            "encode_start",
+            mode="renditions",
+            renditions=[
+                rendition["RenditionName"] for rendition in renditions
+            ],
+            **source_size(job),
+        )
+        job_cpus = cpus.get()
+        try:
+            encode_file_renditions(
+                logger,
+                job.source_file,
+                list(zip(renditions, outputs)),
+                job_cpus,
+            )
+        finally:
+            cpus.put(job_cpus)
+        record(
+            job, "encode_end", output_size=sum(map(os.path.getsize, outputs))
+        )
+        checkpoint(job, "encoded", outputs, outputs=job.output_files)
+        return job
+
+    output = outputs[0]
+    if media is not None and not needs_transcode(
+        logger,
+        media,
+        load_preset("movie"),
+        configuration.encoder.max_bit_rate,
+    ):
+        # Already within the target, only copy the streams.
+        logger.info(f"Remuxing {title}.")
+        record(job, "encode_start", mode="remux", **source_size(job))
+        try:
+            remux_file(logger, job.source_file, output)
+            record(job, "encode_end", output_size=os.path.getsize(output))
+            checkpoint(job, "encoded", outputs, outputs=job.output_files)
+            return job
+        except subprocess.CalledProcessError:
+            logger.warning(f"Falling back to encoding {title}.")
+
+    # Encode torrent.
+    logger.info(f"Encoding {title}.")
+    # Borrow a CPU budget for the duration of the encode.
+    job_cpus = cpus.get()
+    try:
+        if job.source_file is None:
+            record(job, "encode_start", mode="stream")
+            stream_encode_file(
+                logger,
+                job.source_url,
+                output,
+                "movie",
+                job_cpus,
+                configuration.http,
+            )
+        elif (
+            configuration.encoder.segments > 1
+            and media is not None
+            and (media.duration or 0)
+            >= configuration.encoder.segment_min_duration
+        ):
+            record(job, "encode_start", mode="segmented", **source_size(job))
+            encode_file_segmented(
+                logger,
+                job.source_file,
+                output,
+                "movie",
+                configuration.encoder.segments,
+                media.duration,
+                job_cpus,
+                job.medias,
+            )
+        else:
+            record(job, "encode_start", mode="encode", **source_size(job))
             encode_file(
                 logger,
-                os.path.join(os.getcwd(), "medias", downloaded_file),
-                os.path.join(os.getcwd(), "medias", output_file_name),
+                job.source_file,
+                output,
                 "movie",
+                job_cpus,
             )
+    finally:
+        cpus.put(job_cpus)
+    record(job, "encode_end", output_size=os.path.getsize(output))
+    checkpoint(job, "encoded", outputs, outputs=job.output_files)
+
+    return job
 
+
+def upload(logger: logger, job: Job) -> None:
+    """Upload stage."""
+    configuration = get_configuration()
+    report(job, "upload")
+    if "transferred" not in job.checkpoints:
         # Move to JUICEFS.
-        logger.info(f"Moving {title} to JuiceFS Bucket.")
-        shutil.move(
-            os.path.join(os.getcwd(), "medias", output_file_name),
-            os.path.join(
-                os.getcwd(),
-                "juicefs",
-                configuration.juicefs_movie.bucket,
-                output_file_name,
-            ),
+        logger.info(f"Moving {job.torrent.title} to JuiceFS Bucket.")
+        # The outputs of an earlier run may be elsewhere, or named after
+        # another configuration.
+        encoded = job.checkpoints["encoded"]
+        sources = [file["path"] for file in encoded["files"]]
+        outputs = [
+            bucket_path(output_file) for output_file in encoded["outputs"]
+        ]
+        record(job, "transfer_start")
+        size = sum(map(os.path.getsize, sources))
+        for source, output in zip(sources, outputs):
+            # Both encoders would write the same file of the bucket.
+            check_lease(job)
+            if os.path.dirname(source) == os.path.dirname(output):
+                os.replace(source, output)
+            else:
+                transfer_file(
+                    logger,
+                    source,
+                    output,
+                    configuration.transfer.buffer_size,
+                    configuration.transfer.verify,
+                )
+        record(job, "transfer_end", bytes=size)
+        checkpoint(job, "transferred", outputs, outputs=encoded["outputs"])
+    # Index the outputs, for the next jobs of the same source.
+    if (key := artifact_key(job)) is not None:
+        get_db().add_artifact(
+            key,
+            {
+                "files": job.checkpoints["transferred"]["files"],
+                "torrent_id": job.torrent.torrent_id,
+            },
         )
+    get_scratch().release(job.torrent.torrent_id, remove=True)
+
+    # Set torrent status to done.
+    with leases_lock:
+        leases.discard(job.torrent.torrent_id)
+        lost.discard(job.torrent.torrent_id)
+    if not get_db().release(
+        job.torrent.torrent_id, worker_id(), Torrent.TorrentStatus.DONE
+    ):
+        logger.warning(f"Lease of {job.torrent.title} was lost.")
 
-        # Set torrent status to done.
-        torrents.update(
-            {"status": Torrent.TorrentStatus.DONE.value},
-            TorrentQuery.torrent_id == torrent["torrent_id"],
+
+def abandon(logger: logger, job: Job, exc: Exception) -> None:
+    """Release the lease of a failed job, to be retried after a backoff."""
+    configuration = get_configuration()
+    with leases_lock:
+        queued.discard(job.torrent.torrent_id)
+        leases.discard(job.torrent.torrent_id)
+        lost.discard(job.torrent.torrent_id)
+    # The medias are kept for the next attempt.
+    get_scratch().release(job.torrent.torrent_id)
+    try:
+        get_db().release(
+            job.torrent.torrent_id,
+            worker_id(),
+            backoff=configuration.encoder.retry_backoff,
         )
+    except Exception as error:
+        logger.error(f"Failed to release {job.torrent.title}: {error}")
+
+
+def heartbeat(logger: logger, stop: Event) -> None:
+    """Extend the leases of the jobs in progress until stopped."""
+    configuration = get_configuration()
+    while not stop.wait(configuration.encoder.heartbeat_interval):
+        with leases_lock:
+            torrent_ids = list(leases)
+        for torrent_id in torrent_ids:
+            try:
+                if not get_db().heartbeat(
+                    torrent_id,
+                    worker_id(),
+                    configuration.encoder.lease_duration,
+                ):
+                    logger.warning(f"Lease of torrent {torrent_id} was lost.")
+                    with leases_lock:
+                        leases.discard(torrent_id)
+                        lost.add(torrent_id)
+            except Exception as exc:
+                logger.error(f"Failed to extend lease {torrent_id}: {exc}")
+
 
+def jobs(logger: logger) -> Iterator[Job]:
+    """Yield the jobs ready to be processed."""
+    # Encoding torrents are retried once the lease of their encoder expired.
+    torrents = [
+        torrent
+        for torrent in get_db().search(Torrent.TorrentStatus.ENCODING)
+        if (torrent.get("lease_expires") or 0) < time()
+    ]
+    for torrent in torrents:
+        logger.warning(
+            f"Torrent {torrent['title']} has not correctly "
+            "finished the encoding process. "
+            "Resuming from its last checkpoint."
+        )
+    torrents += get_db().search(Torrent.TorrentStatus.DOWNLOADING)
 
-def entrypoint() -> None:
-    """Encoder."""
+    # Snapshot of every tracked torrent, in a single RPC.
+    transmission_torrents = get_transmission().get_torrents(
+        [torrent["torrent_id"] for torrent in torrents]
+    )
+
+    for torrent in torrents:
+        if (
+            transmission_torrent := transmission_torrents.get(
+                torrent["torrent_id"]
+            )
+        ) is None:
+            logger.warning(f"Torrent {torrent['title']} not in Transmission.")
+            continue
+
+        if job := prepare(logger, torrent, transmission_torrent):
+            yield job
+
+
+def setup() -> None:
+    """Prepare the encoder, once per process."""
+    configuration = get_configuration()
     logger.info("Encoder started.")
 
     setup_handbrake(logger)
@@ -100,19 +636,112 @@ def entrypoint() -> None:
         configuration.juicefs_movie.bucket,
     )
 
-    torrents = db.table("torrents")
 
-    for torrent in torrents.search(
-        Query().status == Torrent.TorrentStatus.ENCODING.value
-    ):
-        logger.warning(
-            f"Torrent {torrent['title']} has not correctly "
-            "finished the encoding process. "
-            "Restarting."
-        )
-        process(logger, torrents, torrent)
+def listen() -> Event:
+    """Listen for the events waking the encoder up.
 
-    for torrent in torrents.search(
-        Query().status == Torrent.TorrentStatus.DOWNLOADING.value
-    ):
-        process(logger, torrents, torrent)
+    Returns:
+        Event set on every notification.
+    """
+    configuration = get_configuration()
+    wakeup = Event()
+
+    def notify(body: bytes) -> tuple[int, str]:
+        wakeup.set()
+        return 200, "Encoder notified."
+
+    server = Server(
+        logger,
+        configuration.events.host,
+        configuration.events.port,
+        configuration.events.token,
+    )
+    server.route("POST", "/notify", notify)
+    server.start()
+    return wakeup
+
+
+def feed(
+    logger: logger, wakeup: Optional[Event], once: bool = False
+) -> Iterator[Job]:
+    """Yield the jobs ready to be processed, polling on every notification.
+
+    Args:
+        logger: Instance of logger.
+        wakeup: Event set on every notification, polling every 15 seconds
+            if None.
+        once: Stop after the first poll.
+    """
+    configuration = get_configuration()
+    while True:
+        if failed := get_db().recover(configuration.encoder.max_attempts):
+            logger.error(f"{failed} torrent(s) failed too many times.")
+        # Failed for good, their medias will not be resumed.
+        for torrent in get_db().search(Torrent.TorrentStatus.FAILED):
+            get_scratch().release(torrent["torrent_id"], remove=True)
+        get_scratch().collect()
+
+        for job in jobs(logger):
+            torrent_id = job.torrent.torrent_id
+            with leases_lock:
+                # Still running, including the jobs being abandoned.
+                if torrent_id in queued | leases | lost:
+                    continue
+                queued.add(torrent_id)
+            # Blocks while the download stage is saturated.
+            yield job
+
+        if once:
+            return
+        if wakeup is not None:
+            logger.info(
+                "Waiting for an event, at most "
+                f"{configuration.events.poll_interval} seconds."
+            )
+            wakeup.wait(configuration.events.poll_interval)
+            wakeup.clear()
+        else:
+            logger.info("Sleeping for 15 seconds.")
+            sleep(15)
+
+
+def entrypoint(wakeup: Optional[Event] = None, once: bool = False) -> None:
+    """Encoder, feeding the torrents to a pipeline as they complete.
+
+    Args:
+        wakeup: Event set on every notification, polling every 15 seconds
+            if None.
+        once: Process the completed torrents and return.
+    """
+    configuration = get_configuration()
+    workers = max(1, configuration.encoder.workers)
+    cpus = Queue()
+    for cpu_set in cpu_sets(workers, configuration.encoder.threads_per_job):
+        cpus.put(cpu_set)
+
+    # Movie N+1 downloads and movie N-1 uploads while movie N encodes.
+    pipeline = Pipeline(
+        logger,
+        [
+            Stage(
+                "download",
+                partial(download, logger),
+                configuration.encoder.download_workers,
+            ),
+            Stage("encode", partial(encode, logger, cpus), workers),
+            Stage(
+                "upload",
+                partial(upload, logger),
+                configuration.encoder.upload_workers,
+            ),
+        ],
+        configuration.encoder.queue_size,
+        partial(abandon, logger),
+    )
+
+    stop = Event()
+    Thread(target=heartbeat, args=(logger, stop), daemon=True).start()
+    try:
+        pipeline.run(feed(logger, wakeup, once))
+    finally:
+        stop.set()
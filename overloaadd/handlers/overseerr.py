@@ -1,32 +1,67 @@
 # Standard Library
-from typing import Optional
+from typing import Iterator, Optional
 
 # Third Party
 import requests
 from loguru import logger
 
+# First Party
+from overloaadd import metrics
+from overloaadd.cache import Cache
+from overloaadd.ratelimit import RateLimiter
+
 
 class Overseerr:
     """Overseerr service class."""
 
-    def __init__(self, logger: logger, host: str, api_key: str):
+    def __init__(
+        self,
+        logger: logger,
+        host: str,
+        api_key: str,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[Cache] = None,
+        session: Optional[requests.Session] = None,
+        cache_ttl: float = 86400,
+    ):
         """Initialize Overseerr service.
 
         Args:
             logger: Instance of logger.
             host: Overseerr host.
             api_key: Overseerr API key.
+            rate_limiter: Rate limiter shared by the calls to Overseerr.
+            cache: Cache of the movie details.
+            session: HTTP session, a bare one if None.
+            cache_ttl: Time to live of the cached movie details, in seconds.
         """
         self.logger = logger
         self.host = host
         self.api_key = api_key
-        self.client = requests.Session()
+        self.client = session or requests.Session()
         self.client.headers.update(
             {
                 "X-Api-Key": self.api_key,
             }
         )
         self.prefix = "api/v1"
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+
+    def _get(self, url: str) -> requests.Response:
+        """Send a rate limited GET request to Overseerr.
+
+        Args:
+            url: Requested URL.
+
+        Returns:
+            Response.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with metrics.upstream_seconds.time(service="overseerr"):
+            return self.client.get(url)
 
     def _connection(self) -> bool:
         """Check connection to Overseerr.
@@ -35,25 +70,66 @@ class Overseerr:
             True if connection is successful.
         """
         url = f"{self.host}/{self.prefix}/auth/me"
-        response = self.client.get(url)
+        response = self._get(url)
         response.raise_for_status()
         self.logger.debug("Overseerr connection successful.")
         return True
 
+    def iter_movie_requests(
+        self,
+        page_size: int = 100,
+        sort: str = "added",
+        updated_since: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """Iterate over the movie requests from Overseerr, page by page.
+
+        Args:
+            page_size: Number of requests retrieved per page.
+            sort: Sort order, "added" or "modified" (most recent first).
+            updated_since: Stop at the first request last modified before
+                this ISO 8601 date, requires the "modified" sort order.
+
+        Yields:
+            Movie requests.
+        """
+        skip = 0
+        while True:
+            url = (
+                f"{self.host}/{self.prefix}/request?take={page_size}"
+                f"&skip={skip}&filter=unavailable&sort={sort}"
+            )
+            logger.debug(f"Retrieving movie requests: {url}")
+            response = self._get(url)
+            response.raise_for_status()
+            data = response.json()
+            results = data.get("results", [])
+            self.logger.debug(f"{len(results)} movie request(s) retrieved.")
+
+            for result in results:
+                if (
+                    updated_since
+                    and result.get("updatedAt", "") < updated_since
+                ):
+                    return
+                if result["type"] == "movie":
+                    yield result
+
+            page_info = data.get("pageInfo", {})
+            if (
+                len(results) < page_size
+                or "pages" in page_info
+                and (page_info.get("page", 0) >= page_info["pages"])
+            ):
+                return
+            skip += page_size
+
     def get_movie_requests(self) -> Optional[list]:
         """Get movie requests from Overseerr.
 
         Returns:
             List of movie requests.
         """
-        url = f"{self.host}/{self.prefix}/request?take=1000&filter=unavailable&sort=added"
-        logger.debug(f"Retrieving movie requests: {url}")
-        response = self.client.get(url)
-        response.raise_for_status()
-        self.logger.debug("Movie requests retrieved.")
-        results = response.json().get("results", [])
-
-        return [result for result in results if result["type"] == "movie"]
+        return list(self.iter_movie_requests())
 
     def get_movie_details(self, tmdb_id: int) -> Optional[dict]:
         """Get movie details from Overseerr.
@@ -64,9 +140,20 @@ class Overseerr:
         Returns:
             Movie details.
         """
+        key = f"overseerr:movie:{tmdb_id}"
+        if self.cache is not None:
+            cached, movie = self.cache.lookup(key)
+            if cached:
+                self.logger.debug(f"Movie details cached: {tmdb_id}.")
+                return movie
+
         url = f"{self.host}/{self.prefix}/movie/{tmdb_id}"
         logger.debug(f"Retrieving movie details: {url}")
-        response = self.client.get(url)
+        response = self._get(url)
         response.raise_for_status()
         self.logger.debug("Movie details retrieved.")
-        return response.json()
+        movie = response.json()
+
+        if self.cache is not None:
+            self.cache.set(key, movie, self.cache_ttl)
+        return movie
@@ -1,13 +1,22 @@
 # Standard Library
-from typing import Optional
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Optional
 
 # Third Party
 from loguru import logger
-from transmission_rpc import Client, Torrent
-from transmission_rpc.error import (
-    TransmissionAuthError,
-    TransmissionConnectError,
-)
+
+# First Party
+from overloaadd import metrics
+from overloaadd.client import mount
+from overloaadd.dataclasses import HTTPConfiguration
+
+if TYPE_CHECKING:
+    # Third Party
+    from transmission_rpc import Client, Torrent
+
+# Torrent fields needed to follow the downloads.
+STATUS_FIELDS = ["id", "name", "percentDone", "files", "priorities", "wanted"]
 
 
 class Transmission:
@@ -20,6 +29,8 @@ class Transmission:
         port: int,
         username: str,
         password: str,
+        http: HTTPConfiguration = HTTPConfiguration(),
+        health_interval: float = 60,
     ):
         """Initialize Transmission service.
 
@@ -29,28 +40,49 @@ class Transmission:
             port: Transmission port.
             username: Transmission username.
             password: Transmission password.
+            http: Timeouts, retries and pool of the RPC connections.
+            health_interval: Time, in seconds, during which a successful
+                call vouches for the connection, without checking it again.
         """
         self.logger = logger
         self.host = host
         self.port = port
         self.username = username
         self.password = password
-        self.client = Optional[Client]
+        self.http = http
+        self.health_interval = health_interval
+        self.client: Optional["Client"] = None
+        self.checked_at: Optional[float] = None
+        self.lock = Lock()
         self.logger.info("Transmission service initialized.")
 
-    def _create_client(self) -> Client:
+    def _create_client(self) -> "Client":
         """Create Transmission client.
 
         Returns:
             Transmission client.
         """
+        # Imported on first use, transmission_rpc is slow to import.
+        # Third Party
+        from transmission_rpc import Client
+        from transmission_rpc.error import (
+            TransmissionAuthError,
+            TransmissionConnectError,
+        )
+
         try:
             self.client = Client(
                 host=self.host,
                 port=self.port,
                 username=self.username,
                 password=self.password,
+                timeout=(self.http.connect_timeout, self.http.read_timeout),
             )
+            # Session id renewals (409) are handled by transmission_rpc, the
+            # adapter retries the transient failures. The RPC methods used
+            # are idempotent, duplicate torrents are reported as such.
+            mount(self.client._http_session, self.http, ["POST"])
+            self.checked_at = monotonic()
             self.logger.debug("Transmission client created.")
             return self.client
         except TransmissionAuthError as exc:
@@ -66,25 +98,66 @@ class Transmission:
 
         raise Exception(msg)
 
-    def _connection(self) -> Client:
+    def _connection(self) -> "Client":
         """Connect to Transmission service.
 
+        The connection is only checked once health_interval elapsed since
+        the last successful call.
+
         Returns:
             Transmission client.
         """
+        # Third Party
+        from transmission_rpc.error import TransmissionError
+
+        with self.lock:
+            if self.client is not None and (
+                self.checked_at is not None
+                and monotonic() - self.checked_at < self.health_interval
+            ):
+                return self.client
+
+            if self.client is not None:
+                try:
+                    self.client.get_session()
+                    self.checked_at = monotonic()
+                    self.logger.debug(
+                        "Transmission client already connected. "
+                        "Re-using the active connection."
+                    )
+                    return self.client
+                except TransmissionError:
+                    # No active connection.
+                    self.logger.debug("No active connection to Transmission.")
+
+            return self._create_client()
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        """Call a method of the Transmission client.
+
+        Args:
+            method: Name of the client method.
+
+        Returns:
+            Result of the call.
+        """
+        # Third Party
+        from transmission_rpc.error import (
+            TransmissionConnectError,
+            TransmissionTimeoutError,
+        )
+
+        client = self._connection()
         try:
-            self.client.get_session()
-            self.logger.debug(
-                "Transmission client already connected. "
-                "Re-using the active connection."
-            )
-            return self.client
-        except (AttributeError, TransmissionConnectError):
-            # No client or active connection.
-            self.logger.debug("No active connection to Transmission.")
-            pass
+            with metrics.upstream_seconds.time(service="transmission"):
+                result = getattr(client, method)(*args, **kwargs)
+        except (TransmissionConnectError, TransmissionTimeoutError):
+            # Check the connection again on the next call.
+            self.checked_at = None
+            raise
 
-        return self._create_client()
+        self.checked_at = monotonic()
+        return result
 
     def add_torrent(self, torrent: str) -> int:
         """Add torrent to Transmission service.
@@ -96,29 +169,51 @@ class Transmission:
             Torrent id.
         """
         self.logger.debug(f"Adding torrent: {torrent}")
-        if added_torrent := self._connection().add_torrent(torrent):
+        if added_torrent := self._call("add_torrent", torrent):
             self.logger.info(f"Torrent added: {torrent}")
             return added_torrent.id
 
-    def get_torrent(self, torrent_id: int) -> Torrent:
+    def get_torrent(self, torrent_id: int) -> "Torrent":
         """Get torrent from Transmission service.
 
         Args:
             torrent_id: Torrent id.
         """
         self.logger.debug(f"Getting torrent: {torrent_id}")
-        if torrent := self._connection().get_torrent(torrent_id):
+        if torrent := self._call("get_torrent", torrent_id):
             self.logger.info(f"Torrent found: {torrent_id}")
             return torrent
 
-    def get_completed_torrents(self) -> list[Torrent]:
+    def get_torrents(
+        self, torrent_ids: list[int], fields: list[str] = STATUS_FIELDS
+    ) -> dict[int, "Torrent"]:
+        """Get torrents from Transmission service in a single call.
+
+        Args:
+            torrent_ids: Torrent ids.
+            fields: Torrent fields to retrieve.
+
+        Returns:
+            Torrents by id.
+        """
+        if not torrent_ids:
+            return {}
+
+        self.logger.debug(f"Getting {len(torrent_ids)} torrent(s).")
+        torrents = self._call(
+            "get_torrents", ids=torrent_ids, arguments=fields
+        )
+        self.logger.info(f"{len(torrents)} torrent(s) found.")
+        return {torrent.id: torrent for torrent in torrents}
+
+    def get_completed_torrents(self) -> list["Torrent"]:
         """Get completed torrents from Transmission service.
 
         Returns:
             List of completed torrents.
         """
         self.logger.debug("Getting completed torrent(s).")
-        if completed_torrents := self._connection().get_torrents():
+        if completed_torrents := self._call("get_torrents"):
             self.logger.debug("Torrent(s) found, filtering the results.")
             torrents = [
                 torrent
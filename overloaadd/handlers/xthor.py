@@ -1,63 +1,99 @@
 # Standard Library
-from time import sleep
 from typing import Optional
 
 # Third Party
-import jellyfish
 import requests
 from loguru import logger
 
+# First Party
+from overloaadd import metrics
+from overloaadd.cache import Cache
+from overloaadd.dataclasses import RankingConfiguration
+from overloaadd.ranking import best_release
+from overloaadd.ratelimit import RateLimiter
+
 
 class Xthor:
     """Xthor service class."""
 
-    def __init__(self, logger: logger, api_key: str):
+    def __init__(
+        self,
+        logger: logger,
+        api_key: str,
+        host: str = "https://api.xthor.tk",
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[Cache] = None,
+        session: Optional[requests.Session] = None,
+        cache_ttl: float = 3600,
+        negative_ttl: float = 900,
+        negative_max_ttl: float = 86400,
+        ranking: RankingConfiguration = RankingConfiguration(),
+    ):
         """Initialize Xthor service.
 
         Args:
             logger: Instance of logger.
-            host: Overseerr host.
-            api_key: Overseerr API key.
+            api_key: Xthor passkey.
+            host: Xthor API host.
+            rate_limiter: Rate limiter shared by the calls to Xthor.
+            cache: Cache of the search results.
+            session: HTTP session, a bare one if None.
+            cache_ttl: Time to live of the found torrents, in seconds.
+            negative_ttl: Time to live of the first "no torrent found",
+                doubled on every following miss, in seconds.
+            negative_max_ttl: Maximum time to live of "no torrent found".
+            ranking: Configuration of the release ranking.
         """
         self.logger = logger
-        self.host = "https://api.xthor.tk"
+        self.host = host
         self.api_key = api_key
-        self.client = requests.Session()
+        self.client = session or requests.Session()
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.negative_ttl = negative_ttl
+        self.negative_max_ttl = negative_max_ttl
+        self.ranking = ranking
 
     def search_movie(self, tmdb_id: int, title: str) -> Optional[str]:
+        key = f"xthor:search:{tmdb_id}"
+        if self.cache is not None:
+            cached, download_link = self.cache.lookup(key)
+            if cached:
+                self.logger.debug(f"Search result cached for {title}.")
+                return download_link
+
+        download_link = self._search_movie(tmdb_id, title)
+
+        if self.cache is not None and download_link is not None:
+            self.cache.set(key, download_link, self.cache_ttl)
+        return download_link
+
+    def _search_movie(self, tmdb_id: int, title: str) -> Optional[str]:
         link = f"{self.host}?passkey={self.api_key}&tmdbid={tmdb_id}"
         logger.info(f"Searching for {title} on Xthor.")
         logger.debug(f"Requesting {link}.")
-        response = self.client.get(link)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with metrics.upstream_seconds.time(service="xthor"):
+            response = self.client.get(link)
 
         if response.status_code != 200:
             self.logger.error(f"Failed to search for {title}.")
             return None
 
         data = response.json().get("torrents", [])
-        data = [
-            x
-            for x in data
-            if jellyfish.jaro_winkler_similarity(x["name"], title) >= 0.7
-        ]
-
-        # Sort torrents by weight.
-        # TODO: Implement a better sorting algorithm.
-
-        # Remove all files not containing "MULTi", you can lower the name to compare with.
-        data = [
-            x
-            for x in data
-            if "MULTi" in x["name"]
-            or "MULTI" in x["name"]
-            or "multi" in x["name"]
-        ]
-
-        if data:
+
+        if release := best_release(self.logger, data, title, self.ranking):
             self.logger.info(f"Found a torrent for {title}.")
-            return max(data, key=lambda x: int(x["times_completed"])).get(
-                "download_link"
-            )
+            return release.get("download_link")
         else:
             self.logger.warning(f"No torrents found for {title}.")
+            if self.cache is not None:
+                ttl = self.cache.miss(
+                    f"xthor:search:{tmdb_id}",
+                    self.negative_ttl,
+                    self.negative_max_ttl,
+                )
+                self.logger.debug(f"Not searching {title} for {ttl}s.")
             return None
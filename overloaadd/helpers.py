@@ -1,16 +1,41 @@
 # Standard Library
+import errno
+import hashlib
+import json
+import mmap
 import os
+import re
 import shutil
+import struct
 import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Lock, Thread
+from time import monotonic
+from typing import IO, Any, Callable, Optional
+from urllib.parse import unquote, urlparse
 
 # Third Party
 import requests
 from loguru import logger
 from pydantic import ValidationError
-from videoprops import get_video_properties
 
 # First Party
-from overloaadd.dataclasses import IrilisConfiguration
+from overloaadd import metrics
+from overloaadd.client import TimeoutHTTPAdapter, retry
+from overloaadd.dataclasses import (
+    AudioStream,
+    HTTPConfiguration,
+    IrilisConfiguration,
+    MediaInfo,
+)
+
+# Progress line printed by HandBrakeCLI, the rates once the encode started.
+HANDBRAKE_PROGRESS = re.compile(
+    r"Encoding: task (\d+) of (\d+), ([\d.]+) %"
+    r"(?: \(([\d.]+) fps, avg ([\d.]+) fps, ETA (\d+)h(\d+)m(\d+)s\))?"
+)
 
 
 def load_configuration(logger: logger) -> IrilisConfiguration:
@@ -30,13 +55,379 @@ def load_configuration(logger: logger) -> IrilisConfiguration:
         exit(1)
 
 
-def download_file(url, output_path):
-    local_filename = os.path.join(output_path, url.split("/")[-1])
-    with requests.get(url, stream=True) as r:
-        with open(local_filename, "wb") as f:
-            shutil.copyfileobj(r.raw, f)
+def _save_download_state(state_file: str, state: dict) -> None:
+    with open(f"{state_file}.tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(f"{state_file}.tmp", state_file)
+
+
+def _load_download_state(
+    state_file: str, local_filename: str, url: str, size: int, chunk_size: int
+) -> dict:
+    state = {
+        "url": url,
+        "size": size,
+        "chunk_size": chunk_size,
+        "done": [],
+        "digests": {},
+    }
+    try:
+        with open(state_file, "r") as file:
+            saved_state = json.load(file)
+    except (FileNotFoundError, ValueError):
+        saved_state = None
+
+    if (
+        saved_state is None
+        or not os.path.exists(local_filename)
+        or any(
+            saved_state.get(key) != value
+            for key, value in state.items()
+            if key not in ("done", "digests")
+        )
+    ):
+        # Nothing to resume, preallocate the file.
+        with open(local_filename, "wb") as file:
+            file.truncate(size)
+        _save_download_state(state_file, state)
+        return state
+
+    # Chunks downloaded before the digests were saved are read back once.
+    digests = saved_state.setdefault("digests", {})
+    for index in saved_state["done"]:
+        if str(index) not in digests:
+            digests[str(index)] = _range_digest(
+                local_filename,
+                index * chunk_size,
+                min((index + 1) * chunk_size, size) - 1,
+            )
+    return saved_state
+
+
+def _range_digest(path: str, start: int, end: int) -> str:
+    """Compute the BLAKE2b checksum of a range of a file."""
+    checksum = hashlib.blake2b()
+    with open(path, "rb") as file:
+        file.seek(start)
+        left = end - start + 1
+        while left > 0 and (data := file.read(min(left, 1024 * 1024))):
+            checksum.update(data)
+            left -= len(data)
+    return checksum.hexdigest()
+
+
+def _combine_digests(digests: list[str]) -> str:
+    """Compute the checksum of a file from the checksums of its chunks."""
+    checksum = hashlib.blake2b()
+    for digest in digests:
+        checksum.update(bytes.fromhex(digest))
+    return checksum.hexdigest()
+
+
+def _download_range(
+    session: requests.Session,
+    url: str,
+    fd: int,
+    start: int,
+    end: int,
+) -> str:
+    headers = {"Range": f"bytes={start}-{end}"}
+    checksum = hashlib.blake2b()
+    with session.get(url, headers=headers, stream=True) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise requests.HTTPError(
+                f"Range request not honored for {url}: "
+                f"{response.status_code}"
+            )
+        offset = start
+        for data in response.iter_content(chunk_size=1024 * 1024):
+            os.pwrite(fd, data, offset)
+            checksum.update(data)
+            offset += len(data)
+
+    if offset != end + 1:
+        raise requests.HTTPError(
+            f"Incomplete range {start}-{end} for {url}: "
+            f"got {offset - start} bytes"
+        )
+    return checksum.hexdigest()
+
+
+def download_file(
+    logger: logger,
+    url: str,
+    output_path: str,
+    chunk_size: int = 64 * 1024 * 1024,
+    connections: int = 4,
+    http: HTTPConfiguration = HTTPConfiguration(),
+) -> tuple[str, str]:
+    """Download a file, resuming from its sidecar state file if any.
+
+    The file is fetched in ranges of chunk_size bytes over several pooled
+    connections when the server advertises Accept-Ranges, otherwise it is
+    streamed in one request. Every chunk is checksummed as it is written,
+    the checksum of the file is the one of its chunk checksums, so it
+    depends on chunk_size. Requests time out and are retried according to
+    the HTTP configuration, a stalled connection fails the download.
+
+    Returns:
+        Path and checksum of the file.
+    """
+    local_filename = os.path.join(
+        output_path, unquote(urlparse(url).path.split("/")[-1])
+    )
+    state_file = f"{local_filename}.state.json"
+
+    session = requests.Session()
+    session.mount(
+        urlparse(url).scheme + "://",
+        TimeoutHTTPAdapter(
+            (http.connect_timeout, http.read_timeout),
+            pool_connections=1,
+            pool_maxsize=max(1, connections),
+            max_retries=retry(http),
+        ),
+    )
+
+    started = monotonic()
+    with session:
+        head = session.head(url, allow_redirects=True)
+        head.raise_for_status()
+        size = int(head.headers.get("Content-Length") or 0)
+
+        if head.headers.get("Accept-Ranges") != "bytes" or not size:
+            logger.debug(f"Ranges not supported, streaming {url}.")
+            digests, checksum, filled = [], hashlib.blake2b(), 0
+            with session.get(url, stream=True) as r:
+                r.raise_for_status()
+                with open(local_filename, "wb") as f:
+                    while data := r.raw.read(1024 * 1024):
+                        f.write(data)
+                        view = memoryview(data)
+                        while view:
+                            part = view[: chunk_size - filled]
+                            checksum.update(part)
+                            filled += len(part)
+                            view = view[len(part) :]
+                            if filled == chunk_size:
+                                digests.append(checksum.hexdigest())
+                                checksum, filled = hashlib.blake2b(), 0
+            if filled:
+                digests.append(checksum.hexdigest())
+            size = os.path.getsize(local_filename)
+            metrics.download_bytes.inc(size)
+            _observe_download(size, started)
+            return local_filename, _combine_digests(digests)
+
+        state = _load_download_state(
+            state_file, local_filename, url, size, chunk_size
+        )
+        chunks = [
+            index
+            for index in range(-(-size // chunk_size))
+            if index not in state["done"]
+        ]
+        if state["done"]:
+            logger.info(
+                f"Resuming {local_filename}, "
+                f"{len(chunks)} chunk(s) left to download."
+            )
+
+        lock = Lock()
+        fd = os.open(local_filename, os.O_WRONLY)
+
+        def fetch(index: int) -> None:
+            start = index * chunk_size
+            end = min(start + chunk_size, size) - 1
+            digest = _download_range(session, url, fd, start, end)
+            metrics.download_bytes.inc(end - start + 1)
+            with lock:
+                state["done"].append(index)
+                state["digests"][str(index)] = digest
+                _save_download_state(state_file, state)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, connections)) as pool:
+                # Consume the results to surface the first failure.
+                for _ in pool.map(fetch, chunks):
+                    pass
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    os.remove(state_file)
+    _observe_download(
+        sum(min(chunk_size, size - index * chunk_size) for index in chunks),
+        started,
+    )
+    return local_filename, _combine_digests(
+        [
+            state["digests"][str(index)]
+            for index in range(-(-size // chunk_size))
+        ]
+    )
+
+
+def _observe_download(size: int, started: float) -> None:
+    """Record the average speed of a download."""
+    if (elapsed := monotonic() - started) > 0 and size:
+        metrics.download_speed.observe(size / elapsed)
+
+
+def _kernel_copy(source: int, destination: int, size: int) -> bool:
+    """Copy a file without going through userspace, if supported."""
+    for copy in ("copy_file_range", "sendfile"):
+        if not hasattr(os, copy):
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if copy == "copy_file_range":
+                    copied = os.copy_file_range(
+                        source, destination, size - offset, offset, offset
+                    )
+                else:
+                    copied = os.sendfile(
+                        destination, source, offset, size - offset
+                    )
+                if copied == 0:
+                    break
+                offset += copied
+        except OSError as exc:
+            if exc.errno not in (
+                errno.EXDEV,
+                errno.ENOSYS,
+                errno.EINVAL,
+                errno.EOPNOTSUPP,
+                errno.EBADF,
+            ):
+                raise
+            # Nothing written at an offset, retry with the next method.
+            os.lseek(destination, 0, os.SEEK_SET)
+            os.ftruncate(destination, 0)
+            continue
+        if offset == size:
+            return True
+
+    return False
+
+
+def file_checksum(path: str, buffer_size: int = 16 * 1024 * 1024) -> str:
+    """Compute the BLAKE2b checksum of a file."""
+    checksum = hashlib.blake2b()
+    buffer = mmap.mmap(-1, buffer_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as file:
+        while read := file.readinto(buffer):
+            checksum.update(view[:read])
+    view.release()
+    buffer.close()
+    return checksum.hexdigest()
+
+
+def file_fingerprint(path: str, sample_size: int = 1024 * 1024) -> dict:
+    """Fingerprint a file, cheaply, to check it has not changed.
+
+    The size, the modification time and the BLAKE2b checksum of the first
+    and last samples of the file, a full checksum being too slow for the
+    medias.
+
+    Args:
+        path: Path of the file.
+        sample_size: Size of the samples, in bytes.
+
+    Returns:
+        Fingerprint.
+    """
+    stat = os.stat(path)
+    checksum = hashlib.blake2b()
+    with open(path, "rb") as file:
+        checksum.update(file.read(sample_size))
+        if stat.st_size > sample_size:
+            file.seek(max(sample_size, stat.st_size - sample_size))
+            checksum.update(file.read(sample_size))
+    return {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "checksum": checksum.hexdigest(),
+    }
+
+
+def transfer_file(
+    logger: logger,
+    source: str,
+    destination: str,
+    buffer_size: int = 16 * 1024 * 1024,
+    verify: bool = True,
+    remove_source: bool = True,
+) -> None:
+    """Move a file to another filesystem, atomically and verified.
+
+    The file is written under a temporary name next to the destination,
+    using copy_file_range/sendfile when the filesystems allow it, or large
+    page aligned buffers otherwise, then checked and renamed. The source
+    is kept when remove_source is False, the file being copied.
+    """
+    temporary = os.path.join(
+        os.path.dirname(destination),
+        f".{os.path.basename(destination)}.partial",
+    )
+    started = monotonic()
+    size = os.path.getsize(source)
+    source_checksum = None
+
+    with open(source, "rb", buffering=0) as src, open(
+        temporary, "wb", buffering=0
+    ) as dst:
+        if not _kernel_copy(src.fileno(), dst.fileno(), size):
+            logger.debug("Kernel copy unavailable, copying with buffers.")
+            checksum = hashlib.blake2b()
+            # Anonymous mmaps are page aligned.
+            buffer = mmap.mmap(-1, buffer_size)
+            view = memoryview(buffer)
+            while read := src.readinto(buffer):
+                dst.write(view[:read])
+                checksum.update(view[:read])
+            view.release()
+            buffer.close()
+            source_checksum = checksum.hexdigest()
+        os.fsync(dst.fileno())
+
+    if (transferred := os.path.getsize(temporary)) != size:
+        os.remove(temporary)
+        raise OSError(
+            f"Transfer of {source} is incomplete: {transferred}/{size} bytes"
+        )
+
+    if verify:
+        source_checksum = source_checksum or file_checksum(source, buffer_size)
+        if file_checksum(temporary, buffer_size) != source_checksum:
+            os.remove(temporary)
+            raise OSError(f"Checksum mismatch after transfer of {source}")
+
+    os.replace(temporary, destination)
+    if remove_source:
+        os.remove(source)
+    metrics.transfer_seconds.observe(monotonic() - started)
+    logger.info(f"{source} transferred to {destination}.")
+
+
+def notify_encoder(logger: logger, url: str, token: Optional[str]) -> bool:
+    """Wake the encoder up."""
+    try:
+        response = requests.post(
+            f"{url.rstrip('/')}/notify",
+            headers={"Authorization": token} if token else {},
+            timeout=5,
+        )
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logger.warning(f"Could not notify the encoder: {exc}")
+        return False
 
-    return local_filename
+    logger.debug("Encoder notified.")
+    return True
 
 
 def setup_handbrake(logger: logger) -> None:
@@ -86,8 +477,88 @@ def mount_juicefs(
         exit(1)
 
 
+def cpu_sets(workers: int, threads_per_job: Optional[int]) -> list[set]:
+    """Split the available CPUs in one set per encoder worker."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    else:
+        cpus = list(range(os.cpu_count() or 1))
+
+    size = threads_per_job or max(1, len(cpus) // workers)
+    return [
+        {cpus[(index * size + offset) % len(cpus)] for offset in range(size)}
+        for index in range(workers)
+    ]
+
+
+def _pin_cpus(
+    logger: logger, process: subprocess.Popen, cpus: Optional[set]
+) -> None:
+    """Pin a child process to the CPU budget of the job, if supported.
+
+    The affinity is set from the parent once the child started, a
+    preexec_fn being unsafe in a process running threads.
+    """
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+
+    logger.debug(f"Pinning encoder to CPU(s) {sorted(cpus)}")
+    try:
+        os.sched_setaffinity(process.pid, cpus)
+    except ProcessLookupError:
+        pass
+
+
+def _thread_arguments(
+    logger: logger, encoder: str, cpus: Optional[set], options: dict
+) -> list[str]:
+    """Get the arguments limiting the threads of an encoder to the CPU
+    budget of the job, logging when no budget applies."""
+    if not cpus:
+        return []
+
+    if (arguments := options.get(encoder)) is None:
+        if not hasattr(os, "sched_setaffinity"):
+            logger.info(f"No CPU budget applies to {encoder} here.")
+        return []
+    return [argument.format(len(cpus)) for argument in arguments]
+
+
+def handbrake_thread_arguments(
+    logger: logger, preset: dict, cpus: Optional[set]
+) -> list[str]:
+    """Get the HandBrakeCLI arguments limiting the encoder of a preset to
+    the CPU budget of the job."""
+    encoder = preset.get("VideoEncoder")
+    arguments = _thread_arguments(
+        logger, encoder, cpus, HANDBRAKE_THREAD_OPTIONS
+    )
+    if arguments and (extra := preset.get("VideoOptionExtra")):
+        # --encopts replaces the options of the preset.
+        arguments[-1] = f"{extra}:{arguments[-1]}"
+    return arguments
+
+
+def ffmpeg_thread_arguments(
+    logger: logger, preset: dict, cpus: Optional[set]
+) -> list[str]:
+    """Get the ffmpeg output arguments limiting the encoder of a preset to
+    the CPU budget of the job."""
+    return _thread_arguments(
+        logger,
+        FFMPEG_VIDEO_ENCODERS.get(preset.get("VideoEncoder"), "libx265"),
+        cpus,
+        FFMPEG_THREAD_OPTIONS,
+    )
+
+
 def encode_file(
-    logger: logger, input_file: str, output_file: str, preset_name: str
+    logger: logger,
+    input_file: str,
+    output_file: str,
+    preset_name: str,
+    cpus: Optional[set] = None,
+    arguments: Optional[list[str]] = None,
 ) -> None:
     command = [
         "HandBrakeCLI",
@@ -99,33 +570,745 @@ def encode_file(
         os.path.join(os.getcwd(), "presets", f"{preset_name}.json"),
         "--preset",
         preset_name,
+        *handbrake_thread_arguments(logger, load_preset(preset_name), cpus),
+        *(arguments or []),
     ]
 
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    _pin_cpus(logger, process, cpus)
+
+    # HandBrake logs a lot on stderr, only its tail is kept for the errors.
+    stderr = deque(maxlen=50)
+    reader = Thread(
+        target=lambda: stderr.extend(
+            line.decode(errors="replace") for line in process.stderr
+        ),
+        daemon=True,
+    )
+    reader.start()
+    name = os.path.basename(output_file)
     try:
-        subprocess.run(command, check=True, capture_output=True, text=True)
+        average = _follow_progress(logger, process.stdout, name)
+        process.wait()
+        reader.join()
+    finally:
+        for gauge in (
+            metrics.encode_progress,
+            metrics.encode_fps,
+            metrics.encode_eta,
+        ):
+            gauge.remove(file=name)
+
+    if process.returncode != 0:
+        logger.error("Transcoding failed: {}".format("".join(stderr)))
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr="".join(stderr)
+        )
+
+    if average:
+        metrics.encode_average_fps.observe(average)
+    logger.info("File transcoded successfully")
+
+
+def _follow_progress(logger: logger, stdout: IO[bytes], name: str) -> float:
+    """Parse the progress of HandBrakeCLI as it is printed.
+
+    HandBrake rewrites its progress line with carriage returns, the output
+    is read by blocks and split on both line endings.
+
+    Returns:
+        Average frame rate of the encode, 0 if unknown.
+    """
+    average = 0.0
+    logged = -1
+    pending = b""
+    while block := stdout.read1(4096):
+        *lines, pending = re.split(rb"[\r\n]", pending + block)
+        for line in lines:
+            if not (
+                match := HANDBRAKE_PROGRESS.search(
+                    line.decode(errors="replace")
+                )
+            ):
+                continue
+            task, tasks, percent, fps, avg, hours, minutes, seconds = (
+                match.groups()
+            )
+            progress = (int(task) - 1 + float(percent) / 100) / int(tasks)
+            metrics.encode_progress.set(progress, file=name)
+            if fps is not None:
+                average = float(avg)
+                metrics.encode_fps.set(float(fps), file=name)
+                metrics.encode_eta.set(
+                    int(hours) * 3600 + int(minutes) * 60 + int(seconds),
+                    file=name,
+                )
+            # Log every 10 percent.
+            if int(progress * 10) > logged:
+                logged = int(progress * 10)
+                logger.info(
+                    f"Encoding {name}: {progress:.0%}"
+                    + (
+                        f", {float(fps):.1f} fps, "
+                        f"ETA {hours}h{minutes}m{seconds}s"
+                        if fps is not None
+                        else ""
+                    )
+                )
+
+    return average
+
+
+def split_cpus(cpus: Optional[set], parts: int) -> list[Optional[set]]:
+    """Split a CPU budget in smaller ones, round robin."""
+    if not cpus:
+        return [None] * parts
+
+    ordered = sorted(cpus)
+    return [
+        set(ordered[index::parts]) or {ordered[index % len(ordered)]}
+        for index in range(parts)
+    ]
+
+
+def encode_file_segmented(
+    logger: logger,
+    input_file: str,
+    output_file: str,
+    preset_name: str,
+    segments: int,
+    duration: float,
+    cpus: Optional[set] = None,
+    scratch: Optional[str] = None,
+) -> None:
+    """Encode a file in segments encoded in parallel.
+
+    The video is split at keyframes, every segment is encoded with the
+    preset by its own HandBrakeCLI, then the segments are joined without
+    re-encoding and muxed with the audio, subtitles and chapters of the
+    source. The intermediate files are written to the scratch directory,
+    next to the output by default.
+    """
+    workdir = os.path.join(
+        scratch or os.path.dirname(output_file),
+        f"{os.path.basename(output_file)}.segments",
+    )
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+
+    def ffmpeg(*arguments: str) -> None:
+        command = [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-y",
+            *arguments,
+        ]
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as error:
+            logger.error("Segmented encoding failed: {}".format(error.stderr))
+            raise
+
+    try:
+        # Split the video stream, the segments start on keyframes.
+        ffmpeg(
+            "-i",
+            input_file,
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            "-f",
+            "segment",
+            "-segment_time",
+            f"{duration / segments:.3f}",
+            "-reset_timestamps",
+            "1",
+            os.path.join(workdir, "source-%04d.mkv"),
+        )
+        sources = sorted(
+            os.path.join(workdir, name)
+            for name in os.listdir(workdir)
+            if name.startswith("source-")
+        )
+        logger.info(f"Encoding {len(sources)} segment(s) in parallel.")
+
+        budgets = Queue()
+        for budget in split_cpus(cpus, segments):
+            budgets.put(budget)
+
+        def encode_segment(source: str) -> str:
+            output = source.replace("source-", "encoded-")
+            budget = budgets.get()
+            try:
+                # Audio and subtitles are muxed from the source afterwards,
+                # the crop must be identical across the segments.
+                encode_file(
+                    logger,
+                    source,
+                    output,
+                    preset_name,
+                    budget,
+                    [
+                        "--format",
+                        "av_mkv",
+                        "--audio",
+                        "none",
+                        "--subtitle",
+                        "none",
+                        "--crop",
+                        "0:0:0:0",
+                    ],
+                )
+            finally:
+                budgets.put(budget)
+            return output
+
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            encoded = list(executor.map(encode_segment, sources))
+
+        playlist = os.path.join(workdir, "segments.txt")
+        with open(playlist, "w") as file:
+            for segment in encoded:
+                escaped = segment.replace("'", "'\\''")
+                file.write(f"file '{escaped}'\n")
+
+        video = os.path.join(workdir, "video.mkv")
+        ffmpeg(
+            "-f", "concat", "-safe", "0", "-i", playlist, "-c", "copy", video
+        )
+
+        ffmpeg(
+            "-i",
+            video,
+            "-i",
+            input_file,
+            "-map",
+            "0:v",
+            "-c:v",
+            "copy",
+            *ffmpeg_audio_arguments(load_preset(preset_name), 1),
+            "-map_chapters",
+            "1",
+            "-map_metadata",
+            "1",
+            "-f",
+            "matroska",
+            output_file,
+        )
         logger.info("File transcoded successfully")
-    except subprocess.CalledProcessError as error:
-        logger.error("Transcoding failed: {}".format(error.stderr))
-        exit(1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# HandBrake encoder names and their ffmpeg counterparts.
+FFMPEG_VIDEO_ENCODERS = {
+    "x264": "libx264",
+    "x265": "libx265",
+    "x265_10bit": "libx265",
+    "svt_av1": "libsvtav1",
+    "nvenc_h264": "h264_nvenc",
+    "nvenc_h265": "hevc_nvenc",
+    "qsv_h264": "h264_qsv",
+    "qsv_h265": "hevc_qsv",
+    "vt_h264": "h264_videotoolbox",
+    "vt_h265": "hevc_videotoolbox",
+}
+FFMPEG_QUALITY_OPTIONS = {
+    "libx264": "-crf",
+    "libx265": "-crf",
+    "libsvtav1": "-crf",
+    "h264_nvenc": "-cq",
+    "hevc_nvenc": "-cq",
+    "h264_qsv": "-global_quality",
+    "hevc_qsv": "-global_quality",
+    "h264_videotoolbox": "-q:v",
+    "hevc_videotoolbox": "-q:v",
+}
+FFMPEG_AUDIO_ENCODERS = {
+    "av_aac": "aac",
+    "ca_aac": "aac",
+    "ca_haac": "aac",
+    "fdk_aac": "aac",
+    "ac3": "ac3",
+    "eac3": "eac3",
+    "opus": "libopus",
+    "flac16": "flac",
+    "flac24": "flac",
+}
+FFMPEG_MIXDOWNS = {"mono": 1, "stereo": 2, "dpl2": 2, "5point1": 6}
+
+# Arguments limiting the threads of the software encoders, formatted with
+# the number of CPUs of the job. Hardware encoders have none.
+HANDBRAKE_THREAD_OPTIONS = {
+    "x264": ("--encopts", "threads={}"),
+    "x264_10bit": ("--encopts", "threads={}"),
+    "x265": ("--encopts", "pools={}"),
+    "x265_10bit": ("--encopts", "pools={}"),
+    "x265_12bit": ("--encopts", "pools={}"),
+}
+FFMPEG_THREAD_OPTIONS = {
+    "libx264": ("-threads", "{}"),
+    "libx265": ("-x265-params", "pools={}"),
+}
+
+# Keys of a rendition that are not HandBrake preset settings.
+RENDITION_KEYS = ("RenditionName", "PresetName", "MinWidth", "Passthrough")
+
+
+def load_preset(preset_name: str) -> dict:
+    """Load a HandBrake preset from the presets directory."""
+    with open(
+        os.path.join(os.getcwd(), "presets", f"{preset_name}.json"), "r"
+    ) as file:
+        presets = json.load(file)["PresetList"]
+
+    return next(
+        preset for preset in presets if preset["PresetName"] == preset_name
+    )
+
+
+def load_renditions(renditions_name: str) -> list[dict]:
+    """Load the renditions of a profile from the presets directory.
+
+    Every rendition is named and is either a passthrough of the video, or
+    a HandBrake preset whose settings are overridden by the rendition.
+    """
+    with open(
+        os.path.join(os.getcwd(), "presets", f"{renditions_name}.json"), "r"
+    ) as file:
+        renditions = json.load(file)["RenditionList"]
+
+    return [
+        {
+            "RenditionName": rendition["RenditionName"],
+            "MinWidth": rendition.get("MinWidth", 0),
+            "Passthrough": rendition.get("Passthrough", False),
+            "Preset": (
+                None
+                if rendition.get("Passthrough")
+                else {
+                    **load_preset(rendition.get("PresetName", "movie")),
+                    **{
+                        key: value
+                        for key, value in rendition.items()
+                        if key not in RENDITION_KEYS
+                    },
+                }
+            ),
+        }
+        for rendition in renditions
+    ]
+
+
+def ffmpeg_arguments(preset: dict) -> list[str]:
+    """Translate a HandBrake preset into ffmpeg output arguments."""
+    arguments = ["-map", "0:v:0", *ffmpeg_video_arguments(preset)]
+    if video_filter := ffmpeg_video_filter(preset):
+        arguments += ["-vf", video_filter]
+
+    return arguments + ffmpeg_audio_arguments(preset)
 
 
-def clean_medias(logger: logger) -> None:
-    logger.info("Cleaning medias directory.")
-    shutil.rmtree(os.path.join(os.getcwd(), "medias"))
-    os.makedirs(os.path.join(os.getcwd(), "medias"))
-    logger.info("Medias directory cleaned.")
+def ffmpeg_video_filter(preset: dict) -> Optional[str]:
+    """Translate the picture settings of a HandBrake preset into an ffmpeg
+    video filter, None if the picture is kept."""
+    width = preset.get("PictureWidth")
+    height = preset.get("PictureHeight")
+    if not width or not height or preset.get("PictureAllowUpscaling"):
+        return None
 
+    return (
+        f"scale=w='min(iw,{width})':h='min(ih,{height})'"
+        ":force_original_aspect_ratio=decrease:force_divisible_by=2"
+    )
 
-def is_already_encoded(logger: logger, file_path: str) -> bool:
+
+def ffmpeg_video_arguments(preset: dict) -> list[str]:
+    """Translate the video settings of a HandBrake preset into ffmpeg
+    output arguments, the stream being mapped by the caller."""
+    video_encoder = FFMPEG_VIDEO_ENCODERS.get(
+        preset.get("VideoEncoder"), "libx265"
+    )
+    arguments = ["-c:v", video_encoder]
+
+    if preset.get("VideoQualityType") == 2:
+        arguments += [
+            FFMPEG_QUALITY_OPTIONS.get(video_encoder, "-q:v"),
+            str(preset.get("VideoQualitySlider")),
+        ]
+    else:
+        arguments += ["-b:v", f"{preset.get('VideoAvgBitrate')}k"]
+
+    framerate = preset.get("VideoFramerate")
+    if framerate and framerate != "auto":
+        if preset.get("VideoFramerateMode") == "cfr":
+            arguments += ["-r", framerate]
+        elif preset.get("VideoFramerateMode") == "pfr":
+            arguments += ["-fpsmax", framerate]
+
+    return arguments
+
+
+def ffmpeg_audio_arguments(preset: dict, input_index: int = 0) -> list[str]:
+    """Translate the audio and subtitles of a HandBrake preset into ffmpeg
+    output arguments."""
+    arguments = ["-map", f"{input_index}:a?"]
+    if audio := next(iter(preset.get("AudioList", [])), None):
+        arguments += [
+            "-c:a",
+            FFMPEG_AUDIO_ENCODERS.get(audio.get("AudioEncoder"), "aac"),
+            "-b:a",
+            f"{audio.get('AudioBitrate', 160)}k",
+        ]
+        if channels := FFMPEG_MIXDOWNS.get(audio.get("AudioMixdown")):
+            arguments += ["-ac", str(channels)]
+    else:
+        arguments += ["-c:a", "copy"]
+
+    return arguments + ["-map", f"{input_index}:s?", "-c:s", "copy"]
+
+
+def is_streamable(
+    logger: logger, url: str, http: HTTPConfiguration = HTTPConfiguration()
+) -> bool:
+    """Check whether a remote media can be decoded without seeking.
+
+    Matroska and MPEG-TS are read sequentially. MP4 is only streamable
+    when its moov atom comes before the media data.
+    """
     try:
-        logger.debug(f"Getting video properties for {file_path}")
-        video_properties = get_video_properties(file_path)
-    except Exception as e:
-        logger.error(f"Could not get video properties: {e}")
+        with requests.get(
+            url,
+            headers={"Range": "bytes=0-65535"},
+            stream=True,
+            timeout=(http.connect_timeout, http.read_timeout),
+        ) as response:
+            response.raise_for_status()
+            head = response.raw.read(65536)
+    except requests.RequestException as exc:
+        logger.error(f"Could not read the header of {url}: {exc}")
         return False
 
-    if video_properties.get("codec_name") == "hevc":
-        logger.info(f"{file_path} is already encoded.")
+    # Matroska / WebM.
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
         return True
-    else:
-        return False
+
+    # MPEG-TS, sync byte every 188 bytes.
+    if len(head) > 188 and head[0] == head[188] == 0x47:
+        return True
+
+    # MP4 / MOV, walk the top-level atoms.
+    offset = 0
+    while offset + 8 <= len(head):
+        size, kind = struct.unpack(">I4s", head[offset : offset + 8])
+        if kind == b"moov":
+            return True
+        if kind == b"mdat":
+            logger.debug(f"{url} has a trailing moov atom.")
+            return False
+        if size == 1 and offset + 16 <= len(head):
+            size = struct.unpack(">Q", head[offset + 8 : offset + 16])[0]
+        if size < 8:
+            break
+        offset += size
+
+    return False
+
+
+def stream_encode_file(
+    logger: logger,
+    url: str,
+    output_file: str,
+    preset_name: str,
+    cpus: Optional[set] = None,
+    http: HTTPConfiguration = HTTPConfiguration(),
+) -> None:
+    """Encode a remote file while it is being downloaded.
+
+    The HTTP body is piped into ffmpeg, which encodes with the settings of
+    the HandBrake preset, HandBrakeCLI requiring a seekable input.
+    """
+    preset = load_preset(preset_name)
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        "pipe:0",
+        *ffmpeg_arguments(preset),
+        *ffmpeg_thread_arguments(logger, preset, cpus),
+        "-f",
+        "matroska",
+        output_file,
+    ]
+    errors = []
+
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+    _pin_cpus(logger, process, cpus)
+
+    def feed() -> None:
+        try:
+            with requests.get(
+                url,
+                stream=True,
+                timeout=(http.connect_timeout, http.read_timeout),
+            ) as response:
+                response.raise_for_status()
+                for data in response.iter_content(chunk_size=1024 * 1024):
+                    process.stdin.write(data)
+        except (requests.RequestException, OSError) as exc:
+            errors.append(exc)
+        finally:
+            process.stdin.close()
+
+    feeder = Thread(target=feed, daemon=True)
+    feeder.start()
+    stderr = process.stderr.read().decode(errors="replace")
+    process.wait()
+    feeder.join()
+
+    if process.returncode != 0 or errors:
+        logger.error(
+            "Transcoding failed: {}".format(
+                stderr if process.returncode != 0 else errors[0]
+            )
+        )
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=stderr
+        )
+
+    logger.info("File transcoded successfully")
+
+
+def probe_file(logger: logger, file_path: str) -> Optional[MediaInfo]:
+    """Get the container, video and audio properties of a media."""
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-print_format",
+        "json",
+        "-show_format",
+        "-show_streams",
+        file_path,
+    ]
+    try:
+        logger.debug(f"Probing {file_path}")
+        result = subprocess.run(
+            command, check=True, capture_output=True, text=True
+        )
+        probe = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError) as e:
+        logger.error(f"Could not probe {file_path}: {e}")
+        return None
+
+    def number(value: Optional[str], cast: Callable) -> Optional[Any]:
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return None
+
+    streams = probe.get("streams", [])
+    video = next(
+        (
+            stream
+            for stream in streams
+            if stream.get("codec_type") == "video"
+            and not stream.get("disposition", {}).get("attached_pic")
+        ),
+        {},
+    )
+    media_format = probe.get("format", {})
+    return MediaInfo(
+        container=media_format.get("format_name"),
+        duration=number(media_format.get("duration"), float),
+        bit_rate=number(media_format.get("bit_rate"), int),
+        video_codec=video.get("codec_name"),
+        width=video.get("width"),
+        height=video.get("height"),
+        video_bit_rate=number(video.get("bit_rate"), int),
+        audio=[
+            AudioStream(
+                codec=stream.get("codec_name"),
+                channels=stream.get("channels"),
+                channel_layout=stream.get("channel_layout"),
+                language=stream.get("tags", {}).get("language"),
+            )
+            for stream in streams
+            if stream.get("codec_type") == "audio"
+        ],
+    )
+
+
+def needs_transcode(
+    logger: logger,
+    media: MediaInfo,
+    preset: dict,
+    max_bit_rate: Optional[int] = None,
+) -> bool:
+    """Check whether a media is above the target of a preset.
+
+    Args:
+        max_bit_rate: Target bit rate in kb/s, the average bit rate of the
+            preset by default.
+    """
+    max_bit_rate = (max_bit_rate or preset.get("VideoAvgBitrate") or 0) * 1000
+    # Matroska rarely carries the bit rate of the video stream.
+    bit_rate = media.video_bit_rate or media.bit_rate
+
+    reasons = []
+    if media.video_codec != "hevc":
+        reasons.append(f"codec {media.video_codec}")
+    if (media.width or 0) > (preset.get("PictureWidth") or media.width or 0):
+        reasons.append(f"width {media.width}")
+    if (media.height or 0) > (
+        preset.get("PictureHeight") or media.height or 0
+    ):
+        reasons.append(f"height {media.height}")
+    if max_bit_rate and bit_rate and bit_rate > max_bit_rate:
+        reasons.append(f"bit rate {bit_rate // 1000} kb/s")
+
+    if reasons:
+        logger.debug(f"Transcoding needed: {', '.join(reasons)}.")
+    return bool(reasons)
+
+
+def encode_file_renditions(
+    logger: logger,
+    input_file: str,
+    outputs: list[tuple[dict, str]],
+    cpus: Optional[set] = None,
+) -> None:
+    """Encode several renditions of a file with a single ffmpeg.
+
+    The video is decoded once and split between the encoders of the
+    renditions, each scaled on its own branch of the filter graph, the
+    audio is decoded once too. Passthrough renditions copy the streams.
+
+    Args:
+        logger: Instance of logger.
+        input_file: Source file.
+        outputs: Renditions, see load_renditions, and their output files.
+        cpus: CPU budget of the encode.
+    """
+    encoded = [
+        (rendition, output_file)
+        for rendition, output_file in outputs
+        if not rendition["Passthrough"]
+    ]
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostdin",
+        "-y",
+        "-i",
+        input_file,
+    ]
+    if encoded:
+        branches = [
+            f"[split{index}]"
+            f"{ffmpeg_video_filter(rendition['Preset']) or 'null'}"
+            f"[video{index}]"
+            for index, (rendition, _) in enumerate(encoded)
+        ]
+        command += [
+            "-filter_complex",
+            f"[0:v:0]split={len(encoded)}"
+            + "".join(f"[split{index}]" for index in range(len(encoded)))
+            + ";"
+            + ";".join(branches),
+        ]
+
+    index = 0
+    for rendition, output_file in outputs:
+        if rendition["Passthrough"]:
+            command += [
+                "-map",
+                "0:v:0",
+                "-map",
+                "0:a?",
+                "-map",
+                "0:s?",
+                "-map_chapters",
+                "0",
+                "-c",
+                "copy",
+            ]
+        else:
+            command += [
+                "-map",
+                f"[video{index}]",
+                *ffmpeg_video_arguments(rendition["Preset"]),
+                *ffmpeg_thread_arguments(logger, rendition["Preset"], cpus),
+                *ffmpeg_audio_arguments(rendition["Preset"]),
+            ]
+            index += 1
+        command += ["-f", "matroska", output_file]
+
+    logger.debug(f"Encoding renditions with: {' '.join(command)}")
+    process = subprocess.Popen(
+        command,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    _pin_cpus(logger, process, cpus)
+    stderr = process.communicate()[1]
+    if process.returncode != 0:
+        logger.error("Transcoding failed: {}".format(stderr))
+        raise subprocess.CalledProcessError(
+            process.returncode, command, stderr=stderr
+        )
+
+    logger.info("Renditions transcoded successfully")
+
+
+def remux_file(logger: logger, input_file: str, output_file: str) -> None:
+    """Copy the streams of a media into a Matroska container."""
+    command = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-nostdin",
+        "-y",
+        "-i",
+        input_file,
+        "-map",
+        "0:v",
+        "-map",
+        "0:a?",
+        "-map",
+        "0:s?",
+        "-map_chapters",
+        "0",
+        "-c",
+        "copy",
+        "-f",
+        "matroska",
+        output_file,
+    ]
+
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        logger.info("File remuxed successfully")
+    except subprocess.CalledProcessError as error:
+        logger.error("Remuxing failed: {}".format(error.stderr))
+        raise
@@ -2,18 +2,31 @@
 from time import sleep
 
 # First Party
-from overloaadd.encoder import entrypoint as encoder_entrypoint
+from overloaadd import get_configuration, get_db
 from overloaadd.logger import logger
-from overloaadd.watcher import entrypoint as watcher_entrypoint
 
 
 def encoder() -> None:
     """Encoder entrypoint."""
+    # First Party
+    from overloaadd.encoder import entrypoint as encoder_entrypoint
+    from overloaadd.encoder import listen as encoder_listen
+    from overloaadd.encoder import setup as encoder_setup
+    from overloaadd.metrics import serve as serve_metrics
+
+    configuration = get_configuration()
     try:
-        while True:
-            encoder_entrypoint()
-            logger.info("Sleeping for 15 seconds.")
-            sleep(15)
+        encoder_setup()
+        if configuration.metrics.enabled:
+            serve_metrics(
+                logger,
+                configuration.metrics.host,
+                configuration.metrics.encoder_port,
+            )
+        # Runs until stopped, polling for the completed torrents.
+        encoder_entrypoint(
+            encoder_listen() if configuration.events.enabled else None
+        )
     except KeyboardInterrupt:
         logger.info("Watcher stopped by user.")
         exit(0)
@@ -24,14 +37,54 @@ def encoder() -> None:
 
 def watcher() -> None:
     """Watcher entrypoint."""
+    # First Party
+    from overloaadd.metrics import serve as serve_metrics
+    from overloaadd.watcher import entrypoint as watcher_entrypoint
+    from overloaadd.watcher import listen as watcher_listen
+
+    configuration = get_configuration()
     try:
+        if configuration.metrics.enabled:
+            serve_metrics(
+                logger,
+                configuration.metrics.host,
+                configuration.metrics.watcher_port,
+            )
+        if configuration.webhook.enabled:
+            watcher_listen()
         while True:
+            # With the webhook, polling only reconciles the missed events.
             watcher_entrypoint()
-            logger.info("Sleeping for 15 seconds.")
-            sleep(15)
+            interval = (
+                configuration.webhook.poll_interval
+                if configuration.webhook.enabled
+                else 15
+            )
+            logger.info(f"Sleeping for {interval} seconds.")
+            sleep(interval)
     except KeyboardInterrupt:
         logger.info("Watcher stopped by user.")
         exit(0)
     except Exception as exc:
         logger.error(f"Watcher crashed: {exc}")
         exit(1)
+
+
+def notify() -> None:
+    """Notify entrypoint, e.g. for Transmission script-torrent-done."""
+    # First Party
+    from overloaadd.helpers import notify_encoder
+
+    configuration = get_configuration()
+    if not notify_encoder(
+        logger, configuration.events.url, configuration.events.token
+    ):
+        exit(1)
+
+
+def stats() -> None:
+    """Stats entrypoint, reporting the performance of the finished jobs."""
+    # First Party
+    from overloaadd.stats import report
+
+    print(report(get_db()))
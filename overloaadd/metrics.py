@@ -0,0 +1,286 @@
+# Standard Library
+import math
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from typing import Iterator, TypeVar
+
+# Third Party
+from loguru import logger
+
+# First Party
+from overloaadd.server import Server
+
+# Label values of a series, sorted by label name.
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    pairs = [
+        '{}="{}"'.format(
+            key,
+            value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", ""),
+        )
+        for key, value in labels
+    ]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """Base metric class, a family of series identified by their labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        """Initialize metric.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.lock = Lock()
+        self.series: dict[Labels, float] = {}
+
+    def remove(self, **labels) -> None:
+        """Remove a series, e.g. once its job is done."""
+        with self.lock:
+            self.series.pop(_labels(labels), None)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        """Yield the name, labels and value of every sample."""
+        with self.lock:
+            series = list(self.series.items())
+        for labels, value in series:
+            yield self.name, labels, value
+
+    def render(self) -> list[str]:
+        """Render the metric in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(
+                f"{name}{_format_labels(labels)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    """Monotonic counter class."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increment the counter.
+
+        Args:
+            amount: Increment, positive.
+            labels: Labels of the series.
+        """
+        key = _labels(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge class."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """Set the gauge.
+
+        Args:
+            value: New value.
+            labels: Labels of the series.
+        """
+        with self.lock:
+            self.series[_labels(labels)] = value
+
+
+class Histogram(Metric):
+    """Histogram class, with cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, buckets: tuple[float, ...]
+    ):
+        """Initialize histogram.
+
+        Args:
+            name: Metric name.
+            documentation: Help text.
+            buckets: Sorted upper bounds of the buckets, +Inf is implied.
+        """
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.observations: dict[Labels, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record an observation.
+
+        Args:
+            value: Observed value.
+            labels: Labels of the series.
+        """
+        key = _labels(labels)
+        with self.lock:
+            counts, total = self.observations.get(
+                key, ([0] * len(self.buckets), 0.0)
+            )
+            counts[bisect_left(self.buckets, value)] += 1
+            self.observations[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the duration of a block, in seconds."""
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(monotonic() - start, **labels)
+
+    def remove(self, **labels) -> None:
+        with self.lock:
+            self.observations.pop(_labels(labels), None)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        with self.lock:
+            observations = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.observations.items()
+            ]
+        for labels, counts, total in observations:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    labels + (("le", _format_value(bound)),),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+# Type of a registered metric.
+M = TypeVar("M", bound=Metric)
+
+
+class Registry:
+    """Metrics registry class."""
+
+    def __init__(self):
+        """Initialize metrics registry."""
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        """Register a metric.
+
+        Args:
+            metric: Metric to expose.
+
+        Returns:
+            The registered metric.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text format."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+DURATION_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200, 14400)
+
+download_bytes = registry.register(
+    Counter("overloaadd_download_bytes_total", "Bytes downloaded.")
+)
+download_speed = registry.register(
+    Histogram(
+        "overloaadd_download_bytes_per_second",
+        "Average speed of the downloads.",
+        tuple(2**exponent * 1024 * 1024 for exponent in range(0, 11)),
+    )
+)
+encode_progress = registry.register(
+    Gauge("overloaadd_encode_progress_ratio", "Progress of the encodes.")
+)
+encode_fps = registry.register(
+    Gauge("overloaadd_encode_fps", "Current speed of the encodes.")
+)
+encode_eta = registry.register(
+    Gauge("overloaadd_encode_eta_seconds", "Remaining time of the encodes.")
+)
+encode_average_fps = registry.register(
+    Histogram(
+        "overloaadd_encode_average_fps",
+        "Average speed of the finished encodes.",
+        (1, 2, 5, 10, 20, 30, 60, 120, 240),
+    )
+)
+transfer_seconds = registry.register(
+    Histogram(
+        "overloaadd_transfer_seconds",
+        "Duration of the transfers to the bucket.",
+        DURATION_BUCKETS,
+    )
+)
+stage_seconds = registry.register(
+    Histogram(
+        "overloaadd_stage_seconds",
+        "Duration of the pipeline stages.",
+        DURATION_BUCKETS,
+    )
+)
+stage_jobs = registry.register(
+    Counter("overloaadd_stage_jobs_total", "Jobs processed by the stages.")
+)
+queue_length = registry.register(
+    Gauge("overloaadd_queue_length", "Jobs waiting for a pipeline stage.")
+)
+upstream_seconds = registry.register(
+    Histogram(
+        "overloaadd_upstream_request_seconds",
+        "Latency of the upstream API requests.",
+        LATENCY_BUCKETS,
+    )
+)
+
+
+def serve(logger: logger, host: str, port: int) -> Server:
+    """Expose the metrics at /metrics.
+
+    Args:
+        logger: Instance of logger.
+        host: Listening host.
+        port: Listening port.
+
+    Returns:
+        Server exposing the metrics.
+    """
+    server = Server(logger, host, port)
+    server.route("GET", "/metrics", lambda body: (200, registry.render()))
+    server.start()
+    return server
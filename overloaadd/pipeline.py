@@ -0,0 +1,149 @@
+# Standard Library
+from queue import Queue
+from threading import Thread
+from time import monotonic
+from typing import Any, Callable, Iterable, Optional
+
+# Third Party
+from loguru import logger
+
+# First Party
+from overloaadd import metrics
+
+# Marker telling a stage worker that no more jobs will come.
+_STOP = object()
+
+
+class Stage:
+    """Pipeline stage class."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Any], Optional[Any]],
+        workers: int = 1,
+    ):
+        """Initialize pipeline stage.
+
+        Args:
+            name: Stage name, used in the logs.
+            handler: Callable processing a job, returning the job to hand
+                over to the next stage or None to drop it.
+            workers: Number of jobs processed concurrently by the stage.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+
+
+class Pipeline:
+    """Pipeline class, running stages connected by bounded queues."""
+
+    def __init__(
+        self,
+        logger: logger,
+        stages: list[Stage],
+        queue_size: int,
+        on_error: Optional[Callable[[Any, Exception], None]] = None,
+    ):
+        """Initialize pipeline.
+
+        Args:
+            logger: Instance of logger.
+            stages: Ordered list of stages.
+            queue_size: Maximum number of jobs waiting between two stages.
+            on_error: Callable receiving the jobs dropped on a stage
+                failure, with the exception.
+        """
+        self.logger = logger
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+
+    def _work(
+        self, stage: Stage, inbox: Queue, outbox: Optional[Queue]
+    ) -> None:
+        """Consume the jobs of a stage until the stop marker.
+
+        Args:
+            stage: Stage to run.
+            inbox: Queue of the jobs to process.
+            outbox: Queue of the next stage, if any.
+        """
+        while (job := inbox.get()) is not _STOP:
+            metrics.queue_length.set(inbox.qsize(), stage=stage.name)
+            started = monotonic()
+            try:
+                job = stage.handler(job)
+            except Exception as exc:
+                self.logger.error(
+                    f"Stage {stage.name} failed for {job}: {exc}"
+                )
+                metrics.stage_jobs.inc(stage=stage.name, result="failed")
+                if self.on_error is not None:
+                    # A dead worker would block the stages feeding it.
+                    try:
+                        self.on_error(job, exc)
+                    except Exception as error:
+                        self.logger.error(
+                            f"Failed to handle the failure of {job}: {error}"
+                        )
+                continue
+            finally:
+                metrics.stage_seconds.observe(
+                    monotonic() - started, stage=stage.name
+                )
+
+            metrics.stage_jobs.inc(
+                stage=stage.name,
+                result="dropped" if job is None else "done",
+            )
+
+            if job is not None and outbox is not None:
+                # Blocks while the next stage is saturated.
+                outbox.put(job)
+                metrics.queue_length.set(
+                    outbox.qsize(),
+                    stage=self.stages[self.stages.index(stage) + 1].name,
+                )
+
+    def run(self, jobs: Iterable) -> None:
+        """Run the jobs through every stage and wait for completion.
+
+        Args:
+            jobs: Jobs to feed to the first stage.
+        """
+        queues = [Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = []
+        for index, stage in enumerate(self.stages):
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            threads.append(
+                [
+                    Thread(
+                        target=self._work,
+                        args=(stage, queues[index], outbox),
+                        name=f"{stage.name}-{worker}",
+                        daemon=True,
+                    )
+                    for worker in range(stage.workers)
+                ]
+            )
+
+        for stage_threads in threads:
+            for thread in stage_threads:
+                thread.start()
+
+        for job in jobs:
+            queues[0].put(job)
+            metrics.queue_length.set(
+                queues[0].qsize(), stage=self.stages[0].name
+            )
+
+        # Drain the stages in order, each one stops once the previous one
+        # has handed over all of its jobs.
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                queues[index].put(_STOP)
+            for thread in threads[index]:
+                thread.join()
+            self.logger.debug(f"Stage {stage.name} drained.")
@@ -0,0 +1,115 @@
+# Standard Library
+import math
+import re
+from typing import Optional
+
+# Third Party
+from loguru import logger
+
+# First Party
+from overloaadd.dataclasses import RankingConfiguration
+
+
+def _keyword_score(
+    name: str, scores: dict[str, float], default: float
+) -> float:
+    """Score a release name on the first keyword it contains."""
+    for keyword, score in scores.items():
+        if re.search(rf"(?<![a-z0-9]){re.escape(keyword)}(?![a-z0-9])", name):
+            return score
+    return default
+
+
+def _log_score(value: int, cap: int) -> float:
+    """Score a count on a logarithmic scale, 1 at cap."""
+    return min(1.0, math.log1p(max(0, value)) / math.log1p(max(1, cap)))
+
+
+def score_release(
+    release: dict, title: str, ranking: RankingConfiguration
+) -> Optional[dict[str, float]]:
+    """Score a release.
+
+    Args:
+        release: Release returned by the tracker.
+        title: Movie title.
+        ranking: Ranking configuration.
+
+    Returns:
+        Weighted score of every criterion and their total, None if the
+        release is filtered out.
+    """
+    # Third Party
+    import jellyfish
+
+    name = release.get("name", "").lower()
+    similarity = jellyfish.jaro_winkler_similarity(
+        release.get("name", ""), title
+    )
+    size = int(release.get("size") or 0)
+
+    if (
+        similarity < ranking.min_similarity
+        or not all(keyword.lower() in name for keyword in ranking.required)
+        or size > ranking.max_size
+    ):
+        return None
+
+    weights = ranking.weights
+    breakdown = {
+        "title": weights.title * similarity,
+        "size": weights.size * (1 - size / ranking.max_size),
+        "codec": weights.codec
+        * _keyword_score(name, ranking.codecs, ranking.default_codec),
+        "resolution": weights.resolution
+        * _keyword_score(
+            name, ranking.resolutions, ranking.default_resolution
+        ),
+        "seeders": weights.seeders
+        * _log_score(int(release.get("seeders") or 0), ranking.seeders_cap),
+        "popularity": weights.popularity
+        * _log_score(
+            int(release.get("times_completed") or 0), ranking.popularity_cap
+        ),
+    }
+    breakdown["total"] = sum(breakdown.values())
+    return breakdown
+
+
+def best_release(
+    logger: logger,
+    releases: list[dict],
+    title: str,
+    ranking: RankingConfiguration,
+) -> Optional[dict]:
+    """Pick the release with the best score.
+
+    Args:
+        logger: Instance of logger.
+        releases: Releases returned by the tracker.
+        title: Movie title.
+        ranking: Ranking configuration.
+
+    Returns:
+        Best release, None if every release is filtered out.
+    """
+    scored = []
+    for release in releases:
+        if (breakdown := score_release(release, title, ranking)) is None:
+            continue
+        logger.debug(
+            f"{release.get('name')}: "
+            + ", ".join(
+                f"{key}={value:.2f}" for key, value in breakdown.items()
+            )
+        )
+        scored.append((breakdown["total"], release))
+
+    if not scored:
+        return None
+
+    score, release = max(scored, key=lambda item: item[0])
+    logger.info(
+        f"Best release for {title}: {release.get('name')} ({score:.2f})"
+    )
+    return release
@@ -0,0 +1,39 @@
+# Standard Library
+from threading import Lock
+from time import monotonic, sleep
+
+
+class RateLimiter:
+    """Token bucket rate limiter class, shared between threads."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """Initialize rate limiter.
+
+        Args:
+            rate: Number of calls allowed per second.
+            burst: Number of calls allowed at once after an idle period.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = monotonic()
+        self.lock = Lock()
+
+    def acquire(self) -> None:
+        """Wait until a call is allowed."""
+        while True:
+            with self.lock:
+                now = monotonic()
+                self.tokens = min(
+                    self.burst,
+                    self.tokens + (now - self.updated_at) * self.rate,
+                )
+                self.updated_at = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            sleep(wait)
@@ -0,0 +1,184 @@
+# Standard Library
+import fcntl
+import os
+import shutil
+from threading import Lock
+from time import time
+from typing import Optional
+
+# Third Party
+from loguru import logger
+
+# Lock file of a job directory, held by the encoder running the job.
+LOCK_FILE = ".lock"
+
+
+def disk_usage(path: str) -> int:
+    """Get the size of the files under a directory, in bytes."""
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                pass
+    return size
+
+
+class Scratch:
+    """Scratch space class, one directory per job.
+
+    A job is only admitted when the filesystem has room for its estimated
+    footprint besides the footprints reserved by the running jobs. The
+    directories of the jobs that are not running are kept, to resume them,
+    until garbage collected by age or, when room is needed, least recently
+    used first. A running job holds the lock file of its directory, so that
+    the encoders sharing the scratch space never collect it.
+    """
+
+    def __init__(
+        self,
+        logger: logger,
+        root: str,
+        min_free: int = 0,
+        output_ratio: float = 0.6,
+        max_age: float = 7 * 86400,
+    ):
+        """Initialize scratch space.
+
+        Args:
+            logger: Instance of logger.
+            root: Directory of the job directories.
+            min_free: Space always left free on the filesystem, in bytes.
+            output_ratio: Expected size of the output of a job, relative
+                to its source.
+            max_age: Time, in seconds, after which the directory of a job
+                that is not running is removed.
+        """
+        self.logger = logger
+        self.root = root
+        self.min_free = min_free
+        self.output_ratio = output_ratio
+        self.max_age = max_age
+        self.lock = Lock()
+        self.reservations: dict[str, int] = {}
+        self.locks: dict[str, int] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, job_id: str) -> str:
+        """Get the directory of a job."""
+        return os.path.join(self.root, str(job_id))
+
+    def footprint(self, source_size: int) -> int:
+        """Estimate the space used by a job, source and output."""
+        return int(source_size * (1 + self.output_ratio))
+
+    def _available(self) -> int:
+        """Get the room left for new jobs, in bytes."""
+        free = shutil.disk_usage(self.root).free - self.min_free
+        for job_id, footprint in self.reservations.items():
+            # The part of a reservation not written yet is still free.
+            free -= max(0, footprint - disk_usage(self.path(job_id)))
+        return free
+
+    def reserve(self, job_id: str, source_size: int) -> Optional[str]:
+        """Admit a job, reserving its estimated footprint.
+
+        Args:
+            job_id: Job identifier.
+            source_size: Size of the source of the job, in bytes.
+
+        Returns:
+            Directory of the job, None if there is not enough room.
+        """
+        job_id = str(job_id)
+        path = self.path(job_id)
+        with self.lock:
+            if job_id in self.reservations:
+                return path
+
+            # Files of an interrupted run of the job are part of it.
+            needed = self.footprint(source_size) - (
+                disk_usage(path) if os.path.isdir(path) else 0
+            )
+            if (missing := needed - self._available()) > 0:
+                self._collect(missing)
+                if needed > self._available():
+                    self.logger.warning(
+                        f"Not enough scratch space for job {job_id}, "
+                        f"{needed} bytes needed."
+                    )
+                    return None
+
+            os.makedirs(path, exist_ok=True)
+            if (lock := self._lock(path)) is None:
+                self.logger.warning(f"Job {job_id} is run by another encoder.")
+                return None
+            self.locks[job_id] = lock
+            self.reservations[job_id] = self.footprint(source_size)
+            # Last use of the directory, for the garbage collection.
+            os.utime(path)
+            return path
+
+    def release(self, job_id: str, remove: bool = False) -> None:
+        """Release the reservation of a job.
+
+        Args:
+            job_id: Job identifier.
+            remove: Whether to remove the directory, once the job finished
+                or failed for good.
+        """
+        job_id = str(job_id)
+        with self.lock:
+            self.reservations.pop(job_id, None)
+            if (lock := self.locks.pop(job_id, None)) is not None:
+                os.close(lock)
+            if remove:
+                shutil.rmtree(self.path(job_id), ignore_errors=True)
+
+    def collect(self) -> None:
+        """Remove the directories of the jobs not run for max_age."""
+        with self.lock:
+            self._collect(0)
+
+    def _collect(self, needed: int) -> None:
+        """Remove the expired directories, then the least recently used
+        ones until needed bytes are freed.
+
+        Args:
+            needed: Bytes to free.
+        """
+        idle = []
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name not in self.reservations:
+                idle.append((entry.stat().st_mtime, entry.path))
+
+        freed = 0
+        for mtime, path in sorted(idle):
+            if time() - mtime < self.max_age and freed >= needed:
+                break
+            # Running in another encoder.
+            if (lock := self._lock(path)) is None:
+                continue
+            try:
+                size = disk_usage(path)
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                os.close(lock)
+            freed += size
+            self.logger.info(f"Removed scratch directory {path}.")
+
+    @staticmethod
+    def _lock(path: str) -> Optional[int]:
+        """Lock a job directory, released when its descriptor is closed.
+
+        Returns:
+            Descriptor of the lock file, None if locked by another process.
+        """
+        fd = os.open(os.path.join(path, LOCK_FILE), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
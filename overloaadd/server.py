@@ -0,0 +1,114 @@
+# Standard Library
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Callable, Optional
+
+# Third Party
+from loguru import logger
+
+# A route handler receives the request body and returns the response status
+# code and text.
+Handler = Callable[[bytes], tuple[int, str]]
+
+
+class Server:
+    """Embedded HTTP server class."""
+
+    def __init__(
+        self,
+        logger: logger,
+        host: str,
+        port: int,
+        token: Optional[str] = None,
+    ):
+        """Initialize embedded HTTP server.
+
+        Args:
+            logger: Instance of logger.
+            host: Listening host.
+            port: Listening port.
+            token: Value of the Authorization header required by the POST
+                routes, if any.
+        """
+        self.logger = logger
+        self.host = host
+        self.port = port
+        self.token = token
+        self.routes: dict[tuple[str, str], Handler] = {}
+        self.httpd: Optional[ThreadingHTTPServer] = None
+
+    def route(self, method: str, path: str, handler: Handler) -> None:
+        """Register a route.
+
+        Args:
+            method: HTTP method.
+            path: URL path.
+            handler: Route handler.
+        """
+        self.routes[(method, path)] = handler
+
+    def _request_handler(self) -> type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this server."""
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def _handle(self, method: str) -> None:
+                path = self.path.split("?", 1)[0]
+                if (handler := server.routes.get((method, path))) is None:
+                    self._respond(404, "Not found.")
+                    return
+
+                if (
+                    method == "POST"
+                    and server.token
+                    and not hmac.compare_digest(
+                        self.headers.get("Authorization", ""), server.token
+                    )
+                ):
+                    self._respond(401, "Unauthorized.")
+                    return
+
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                try:
+                    status, text = handler(body)
+                except Exception as exc:
+                    server.logger.error(f"{method} {path} failed: {exc}")
+                    status, text = 500, "Internal error."
+                self._respond(status, text)
+
+            def _respond(self, status: int, text: str) -> None:
+                data = text.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self) -> None:
+                self._handle("GET")
+
+            def do_POST(self) -> None:
+                self._handle("POST")
+
+            def log_message(self, format: str, *args) -> None:
+                server.logger.debug(f"HTTP {format % args}")
+
+        return RequestHandler
+
+    def start(self) -> None:
+        """Start serving in a background thread."""
+        self.httpd = ThreadingHTTPServer(
+            (self.host, self.port), self._request_handler()
+        )
+        self.httpd.daemon_threads = True
+        Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.logger.info(f"Listening on {self.host}:{self.port}.")
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -0,0 +1,152 @@
+# Standard Library
+import math
+from collections import defaultdict
+from typing import Optional
+
+# First Party
+from overloaadd.dataclasses import Torrent
+from overloaadd.storage import Storage
+
+# Stages timed by their start and end events.
+STAGES = ("download", "encode", "transfer")
+
+# Source resolutions, by minimum picture height.
+RESOLUTIONS = ((2000, "2160p"), (1000, "1080p"), (700, "720p"), (0, "SD"))
+
+
+def percentile(values: list[float], rank: float) -> Optional[float]:
+    """Compute a percentile, interpolating between the closest ranks.
+
+    Args:
+        values: Measured values.
+        rank: Percentile, between 0 and 100.
+
+    Returns:
+        Percentile, None without values.
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * rank / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (
+        position - lower
+    )
+
+
+def resolution(height: Optional[int]) -> str:
+    """Get the resolution name of a picture height."""
+    for minimum, name in RESOLUTIONS:
+        if (height or 0) >= minimum:
+            return name
+    return "SD"
+
+
+def summarize(timeline: list[dict]) -> dict:
+    """Summarize the timeline of a torrent.
+
+    A retried stage is timed from its last start.
+
+    Args:
+        timeline: Events of the torrent.
+
+    Returns:
+        Stage durations, in seconds, and the measurements of the encode.
+    """
+    starts = {}
+    summary = {"durations": {}}
+    for entry in timeline:
+        event = entry.get("event", "")
+        if event.endswith("_start"):
+            starts[event[: -len("_start")]] = entry["at"]
+        elif event.endswith("_end"):
+            stage = event[: -len("_end")]
+            if stage in starts:
+                summary["durations"][stage] = entry["at"] - starts[stage]
+        if event == "queued":
+            summary["queued"] = entry["at"]
+        elif event == "probe":
+            summary["height"] = entry.get("height")
+            summary["duration"] = entry.get("duration")
+        elif event == "encode_start":
+            summary["mode"] = entry.get("mode")
+            summary["source_size"] = entry.get("source_size")
+        elif event == "encode_end":
+            summary["output_size"] = entry.get("output_size")
+        elif event == "transfer_end" and "queued" in summary:
+            summary["durations"]["total"] = entry["at"] - summary["queued"]
+
+    return summary
+
+
+def report(db: Storage) -> str:
+    """Build the performance report of the finished torrents.
+
+    Args:
+        db: Job store.
+
+    Returns:
+        Report, as text.
+    """
+    summaries = [
+        summarize(torrent.get("timeline", []))
+        for torrent in db.search(Torrent.TorrentStatus.DONE)
+    ]
+
+    lines = [f"{len(summaries)} finished torrent(s).", ""]
+    lines.append(f"{'Stage':<10} {'Count':>6} {'p50':>10} {'p95':>10}")
+    for stage in (*STAGES, "total"):
+        durations = [
+            summary["durations"][stage]
+            for summary in summaries
+            if stage in summary["durations"]
+        ]
+        if durations:
+            lines.append(
+                f"{stage:<10} {len(durations):>6} "
+                f"{_duration(percentile(durations, 50)):>10} "
+                f"{_duration(percentile(durations, 95)):>10}"
+            )
+
+    speeds = defaultdict(list)
+    ratios = defaultdict(list)
+    for summary in summaries:
+        name = f"{resolution(summary.get('height'))} {summary.get('mode')}"
+        encode = summary["durations"].get("encode")
+        if encode and summary.get("duration"):
+            speeds[name].append(summary["duration"] / encode)
+        if summary.get("source_size") and summary.get("output_size"):
+            ratios[name].append(
+                summary["output_size"] / summary["source_size"]
+            )
+
+    lines += [
+        "",
+        f"{'Source':<16} {'Count':>6} {'Speed p50':>10} {'Speed p95':>10} "
+        f"{'Ratio p50':>10}",
+    ]
+    for name in sorted(set(speeds) | set(ratios)):
+        lines.append(
+            f"{name:<16} {len(speeds[name]):>6} "
+            f"{_speed(percentile(speeds[name], 50)):>10} "
+            f"{_speed(percentile(speeds[name], 95)):>10} "
+            f"{_ratio(percentile(ratios[name], 50)):>10}"
+        )
+
+    return "\n".join(lines)
+
+
+def _duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def _speed(speed: Optional[float]) -> str:
+    return "-" if speed is None else f"{speed:.2f}x"
+
+
+def _ratio(ratio: Optional[float]) -> str:
+    return "-" if ratio is None else f"{ratio:.0%}"
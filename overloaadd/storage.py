@@ -0,0 +1,647 @@
+# Standard Library
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from threading import Lock, local
+from time import time
+from typing import Optional
+
+# Third Party
+from loguru import logger
+from tinydb import Query, TinyDB
+
+# First Party
+from overloaadd.dataclasses import JournalMode, StorageConfiguration, Torrent
+
+# Columns of the torrents table, the other fields are stored as JSON.
+COLUMNS = ("torrent_id", "tmdb_id", "title", "year", "status")
+# Columns of the job leases, taken by the encoders processing the torrents.
+LEASE_COLUMNS = ("lease_owner", "lease_expires", "attempts")
+
+
+class Storage(ABC):
+    """Job store interface."""
+
+    @abstractmethod
+    def insert(self, torrent: Torrent) -> None:
+        """Insert a torrent.
+
+        Args:
+            torrent: Torrent to insert.
+        """
+
+    @abstractmethod
+    def get(self, torrent_id: int) -> Optional[dict]:
+        """Get a torrent.
+
+        Args:
+            torrent_id: Transmission torrent id.
+
+        Returns:
+            Torrent row.
+        """
+
+    @abstractmethod
+    def exists(self, tmdb_id: int) -> bool:
+        """Check whether a movie has a torrent.
+
+        Args:
+            tmdb_id: TheMovieDB ID.
+
+        Returns:
+            True if the movie has a torrent.
+        """
+
+    @abstractmethod
+    def search(self, status: Torrent.TorrentStatus) -> list[dict]:
+        """Get the torrents with a status.
+
+        Args:
+            status: Torrent status.
+
+        Returns:
+            List of torrent rows.
+        """
+
+    @abstractmethod
+    def update(self, torrent_id: int, fields: dict) -> None:
+        """Update the fields of a torrent.
+
+        Args:
+            torrent_id: Transmission torrent id.
+            fields: Fields to update.
+        """
+
+    @abstractmethod
+    def append_event(self, torrent_id: int, event: str, **fields) -> None:
+        """Append an event to the timeline of a torrent.
+
+        Args:
+            torrent_id: Transmission torrent id.
+            event: Event name.
+            fields: Measurements attached to the event.
+        """
+
+    @abstractmethod
+    def claim(self, torrent_id: int, owner: str, duration: float) -> bool:
+        """Lease a torrent to an encoder, setting its status to encoding.
+
+        Downloading torrents and encoding torrents whose lease expired can
+        be claimed.
+
+        Args:
+            torrent_id: Transmission torrent id.
+            owner: Encoder identifier.
+            duration: Lease duration, in seconds.
+
+        Returns:
+            True if the torrent was claimed.
+        """
+
+    @abstractmethod
+    def heartbeat(self, torrent_id: int, owner: str, duration: float) -> bool:
+        """Extend the lease of a torrent.
+
+        Args:
+            torrent_id: Transmission torrent id.
+            owner: Encoder identifier.
+            duration: Lease duration from now, in seconds.
+
+        Returns:
+            True if the encoder still holds the lease.
+        """
+
+    @abstractmethod
+    def release(
+        self,
+        torrent_id: int,
+        owner: str,
+        status: Optional[Torrent.TorrentStatus] = None,
+        backoff: Optional[float] = None,
+    ) -> bool:
+        """Release the lease of a torrent.
+
+        Args:
+            torrent_id: Transmission torrent id.
+            owner: Encoder identifier.
+            status: New status, unchanged if None.
+            backoff: Delay before the torrent can be claimed again, in
+                seconds, doubled on every attempt, none if None.
+
+        Returns:
+            True if the encoder held the lease.
+        """
+
+    @abstractmethod
+    def recover(self, max_attempts: int) -> int:
+        """Fail the expired torrents that were claimed too many times.
+
+        Args:
+            max_attempts: Maximum number of claims of a torrent.
+
+        Returns:
+            Number of failed torrents.
+        """
+
+    @abstractmethod
+    def find_artifact(self, key: str) -> Optional[dict]:
+        """Get an encoded output from the index of the artifacts.
+
+        Args:
+            key: Checksums of the source and of the encoding settings.
+
+        Returns:
+            Artifact, with the path of the output.
+        """
+
+    @abstractmethod
+    def add_artifact(self, key: str, artifact: dict) -> None:
+        """Index an encoded output, replacing the one of the same key.
+
+        Args:
+            key: Checksums of the source and of the encoding settings.
+            artifact: Artifact, with the path of the output.
+        """
+
+    @abstractmethod
+    def remove_artifact(self, key: str) -> None:
+        """Remove an encoded output from the index of the artifacts.
+
+        Args:
+            key: Checksums of the source and of the encoding settings.
+        """
+
+
+class TinyDBStorage(Storage):
+    """TinyDB job store class, safe between the threads of one process."""
+
+    def __init__(self, path: str):
+        """Initialize TinyDB job store.
+
+        Args:
+            path: Path of the JSON database.
+        """
+        database = TinyDB(path)
+        self.torrents = database.table("torrents")
+        self.artifacts = database.table("artifacts")
+        # TinyDB rewrites the whole file on every write.
+        self.lock = Lock()
+
+    def insert(self, torrent: Torrent) -> None:
+        with self.lock:
+            self.torrents.insert(torrent.model_dump(mode="json"))
+
+    def get(self, torrent_id: int) -> Optional[dict]:
+        with self.lock:
+            return self.torrents.get(Query().torrent_id == torrent_id)
+
+    def exists(self, tmdb_id: int) -> bool:
+        with self.lock:
+            return self.torrents.contains(Query().tmdb_id == tmdb_id)
+
+    def search(self, status: Torrent.TorrentStatus) -> list[dict]:
+        with self.lock:
+            return self.torrents.search(Query().status == status.value)
+
+    def update(self, torrent_id: int, fields: dict) -> None:
+        with self.lock:
+            self.torrents.update(fields, Query().torrent_id == torrent_id)
+
+    def append_event(self, torrent_id: int, event: str, **fields) -> None:
+        entry = {"event": event, "at": time(), **fields}
+        with self.lock:
+            for document in self.torrents.search(
+                Query().torrent_id == torrent_id
+            ):
+                self.torrents.update(
+                    {"timeline": [*document.get("timeline", []), entry]},
+                    doc_ids=[document.doc_id],
+                )
+
+    @staticmethod
+    def _expired(document: dict) -> bool:
+        return (document.get("lease_expires") or 0) < time()
+
+    def claim(self, torrent_id: int, owner: str, duration: float) -> bool:
+        def claimable(document: dict) -> bool:
+            return document.get("status") == (
+                Torrent.TorrentStatus.DOWNLOADING.value
+            ) or (
+                document.get("status") == Torrent.TorrentStatus.ENCODING.value
+                and self._expired(document)
+            )
+
+        with self.lock:
+            documents = [
+                document
+                for document in self.torrents.search(
+                    Query().torrent_id == torrent_id
+                )
+                if claimable(document)
+            ]
+            for document in documents:
+                self.torrents.update(
+                    {
+                        "status": Torrent.TorrentStatus.ENCODING.value,
+                        "lease_owner": owner,
+                        "lease_expires": time() + duration,
+                        "attempts": document.get("attempts", 0) + 1,
+                    },
+                    doc_ids=[document.doc_id],
+                )
+            return bool(documents)
+
+    def heartbeat(self, torrent_id: int, owner: str, duration: float) -> bool:
+        with self.lock:
+            return bool(
+                self.torrents.update(
+                    {"lease_expires": time() + duration},
+                    (Query().torrent_id == torrent_id)
+                    & (Query().lease_owner == owner),
+                )
+            )
+
+    def release(
+        self,
+        torrent_id: int,
+        owner: str,
+        status: Optional[Torrent.TorrentStatus] = None,
+        backoff: Optional[float] = None,
+    ) -> bool:
+        fields = {"lease_owner": None, "lease_expires": None}
+        if status is not None:
+            fields["status"] = status.value
+        with self.lock:
+            documents = self.torrents.search(
+                (Query().torrent_id == torrent_id)
+                & (Query().lease_owner == owner)
+            )
+            for document in documents:
+                if backoff is not None:
+                    fields["lease_expires"] = time() + backoff * 2 ** (
+                        document.get("attempts", 0)
+                    )
+                self.torrents.update(fields, doc_ids=[document.doc_id])
+            return bool(documents)
+
+    def recover(self, max_attempts: int) -> int:
+        with self.lock:
+            return len(
+                self.torrents.update(
+                    {
+                        "status": Torrent.TorrentStatus.FAILED.value,
+                        "lease_owner": None,
+                        "lease_expires": None,
+                    },
+                    (Query().status == Torrent.TorrentStatus.ENCODING.value)
+                    & (Query().attempts >= max_attempts)
+                    & Query().lease_expires.test(
+                        lambda expires: (expires or 0) < time()
+                    ),
+                )
+            )
+
+    def find_artifact(self, key: str) -> Optional[dict]:
+        with self.lock:
+            document = self.artifacts.get(Query().key == key)
+        return document["artifact"] if document is not None else None
+
+    def add_artifact(self, key: str, artifact: dict) -> None:
+        with self.lock:
+            self.artifacts.upsert(
+                {"key": key, "artifact": artifact}, Query().key == key
+            )
+
+    def remove_artifact(self, key: str) -> None:
+        with self.lock:
+            self.artifacts.remove(Query().key == key)
+
+
+class SQLiteStorage(Storage):
+    """SQLite job store class, safe between threads and processes."""
+
+    # Schema migrations, applied in order according to user_version.
+    migrations = [
+        (
+            "CREATE TABLE torrents ("
+            "id INTEGER PRIMARY KEY, "
+            "torrent_id INTEGER NOT NULL, "
+            "tmdb_id INTEGER NOT NULL, "
+            "title TEXT NOT NULL, "
+            "year INTEGER, "
+            "status TEXT NOT NULL, "
+            "data TEXT NOT NULL DEFAULT '{}')",
+            "CREATE INDEX torrents_torrent_id ON torrents (torrent_id)",
+            "CREATE INDEX torrents_tmdb_id ON torrents (tmdb_id)",
+            "CREATE INDEX torrents_status ON torrents (status)",
+        ),
+        (
+            "ALTER TABLE torrents ADD COLUMN lease_owner TEXT",
+            "ALTER TABLE torrents ADD COLUMN lease_expires REAL",
+            "ALTER TABLE torrents "
+            "ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+            "CREATE INDEX torrents_lease ON torrents (status, lease_expires)",
+        ),
+        (
+            "CREATE TABLE artifacts ("
+            "key TEXT PRIMARY KEY, "
+            "data TEXT NOT NULL)",
+        ),
+    ]
+
+    def __init__(self, path: str, journal_mode: JournalMode = "wal"):
+        """Initialize SQLite job store.
+
+        Args:
+            path: Path of the SQLite database.
+            journal_mode: SQLite journal mode, WAL needs every process on
+                the same host, use "delete" for a database shared over a
+                network filesystem with working locks.
+        """
+        self.path = path
+        self.journal_mode = journal_mode
+        self.local = local()
+
+        with self.transaction() as connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for statements in self.migrations[version:]:
+                for statement in statements:
+                    connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {len(self.migrations)}")
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection of the current thread."""
+        if (connection := getattr(self.local, "connection", None)) is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None
+            )
+            connection.row_factory = sqlite3.Row
+            connection.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def transaction(self) -> "_Transaction":
+        """Open a write transaction, taking the database lock upfront."""
+        return _Transaction(self.connection)
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> dict:
+        return {
+            **json.loads(row["data"]),
+            **{column: row[column] for column in COLUMNS + LEASE_COLUMNS},
+        }
+
+    def insert(self, torrent: Torrent) -> None:
+        row = torrent.model_dump(mode="json")
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO torrents "
+                "(torrent_id, tmdb_id, title, year, status, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    *(row.pop(column) for column in COLUMNS),
+                    json.dumps(row),
+                ),
+            )
+
+    def get(self, torrent_id: int) -> Optional[dict]:
+        row = self.connection.execute(
+            "SELECT * FROM torrents WHERE torrent_id = ? "
+            "ORDER BY id DESC LIMIT 1",
+            (torrent_id,),
+        ).fetchone()
+        return self._row(row) if row is not None else None
+
+    def exists(self, tmdb_id: int) -> bool:
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM torrents WHERE tmdb_id = ? LIMIT 1",
+                (tmdb_id,),
+            ).fetchone()
+            is not None
+        )
+
+    def search(self, status: Torrent.TorrentStatus) -> list[dict]:
+        return [
+            self._row(row)
+            for row in self.connection.execute(
+                "SELECT * FROM torrents WHERE status = ? ORDER BY id",
+                (status.value,),
+            )
+        ]
+
+    def update(self, torrent_id: int, fields: dict) -> None:
+        with self.transaction() as connection:
+            for row in connection.execute(
+                "SELECT id, data FROM torrents WHERE torrent_id = ?",
+                (torrent_id,),
+            ).fetchall():
+                data = {
+                    **json.loads(row["data"]),
+                    **{
+                        key: value
+                        for key, value in fields.items()
+                        if key not in COLUMNS + LEASE_COLUMNS
+                    },
+                }
+                columns = {
+                    key: value
+                    for key, value in fields.items()
+                    if key in COLUMNS + LEASE_COLUMNS
+                }
+                connection.execute(
+                    "UPDATE torrents SET "
+                    + "".join(f"{column} = ?, " for column in columns)
+                    + "data = ? WHERE id = ?",
+                    (*columns.values(), json.dumps(data), row["id"]),
+                )
+
+    def append_event(self, torrent_id: int, event: str, **fields) -> None:
+        entry = {"event": event, "at": time(), **fields}
+        with self.transaction() as connection:
+            for row in connection.execute(
+                "SELECT id, data FROM torrents WHERE torrent_id = ?",
+                (torrent_id,),
+            ).fetchall():
+                data = json.loads(row["data"])
+                data["timeline"] = [*data.get("timeline", []), entry]
+                connection.execute(
+                    "UPDATE torrents SET data = ? WHERE id = ?",
+                    (json.dumps(data), row["id"]),
+                )
+
+    def claim(self, torrent_id: int, owner: str, duration: float) -> bool:
+        now = time()
+        with self.transaction() as connection:
+            return (
+                connection.execute(
+                    "UPDATE torrents SET status = ?, lease_owner = ?, "
+                    "lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE torrent_id = ? AND (status = ? OR (status = ? "
+                    "AND COALESCE(lease_expires, 0) < ?))",
+                    (
+                        Torrent.TorrentStatus.ENCODING.value,
+                        owner,
+                        now + duration,
+                        torrent_id,
+                        Torrent.TorrentStatus.DOWNLOADING.value,
+                        Torrent.TorrentStatus.ENCODING.value,
+                        now,
+                    ),
+                ).rowcount
+                > 0
+            )
+
+    def heartbeat(self, torrent_id: int, owner: str, duration: float) -> bool:
+        with self.transaction() as connection:
+            return (
+                connection.execute(
+                    "UPDATE torrents SET lease_expires = ? "
+                    "WHERE torrent_id = ? AND lease_owner = ?",
+                    (time() + duration, torrent_id, owner),
+                ).rowcount
+                > 0
+            )
+
+    def release(
+        self,
+        torrent_id: int,
+        owner: str,
+        status: Optional[Torrent.TorrentStatus] = None,
+        backoff: Optional[float] = None,
+    ) -> bool:
+        with self.transaction() as connection:
+            return (
+                connection.execute(
+                    "UPDATE torrents SET status = COALESCE(?, status), "
+                    "lease_owner = NULL, "
+                    "lease_expires = ? + ? * (1 << attempts) "
+                    "WHERE torrent_id = ? AND lease_owner = ?",
+                    (
+                        status.value if status is not None else None,
+                        time(),
+                        backoff,
+                        torrent_id,
+                        owner,
+                    ),
+                ).rowcount
+                > 0
+            )
+
+    def recover(self, max_attempts: int) -> int:
+        with self.transaction() as connection:
+            return connection.execute(
+                "UPDATE torrents SET status = ?, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE status = ? AND attempts >= ? "
+                "AND COALESCE(lease_expires, 0) < ?",
+                (
+                    Torrent.TorrentStatus.FAILED.value,
+                    Torrent.TorrentStatus.ENCODING.value,
+                    max_attempts,
+                    time(),
+                ),
+            ).rowcount
+
+    def find_artifact(self, key: str) -> Optional[dict]:
+        row = self.connection.execute(
+            "SELECT data FROM artifacts WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row["data"]) if row is not None else None
+
+    def add_artifact(self, key: str, artifact: dict) -> None:
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO artifacts (key, data) VALUES (?, ?)",
+                (key, json.dumps(artifact)),
+            )
+
+    def remove_artifact(self, key: str) -> None:
+        with self.transaction() as connection:
+            connection.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+
+    def migrate(self, logger: logger, path: str) -> None:
+        """Import the torrents of a TinyDB database, once.
+
+        Args:
+            logger: Instance of logger.
+            path: Path of the TinyDB JSON database.
+        """
+        if not os.path.exists(path):
+            return
+
+        with open(path, "r") as file:
+            # TinyDB leaves an empty file behind when nothing was written.
+            documents = json.loads(file.read() or "{}").get("torrents", {})
+
+        with self.transaction() as connection:
+            if connection.execute("SELECT 1 FROM torrents LIMIT 1").fetchone():
+                logger.warning(f"Job store not empty, {path} not migrated.")
+                return
+
+            for doc_id, document in sorted(
+                documents.items(), key=lambda item: int(item[0])
+            ):
+                row = Torrent.model_validate(document).model_dump(mode="json")
+                row.update(
+                    {
+                        key: value
+                        for key, value in document.items()
+                        if key not in row
+                    }
+                )
+                connection.execute(
+                    "INSERT INTO torrents "
+                    "(id, torrent_id, tmdb_id, title, year, status, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        int(doc_id),
+                        *(row.pop(column) for column in COLUMNS),
+                        json.dumps(row),
+                    ),
+                )
+
+        os.replace(path, f"{path}.migrated")
+        logger.info(f"{len(documents)} torrent(s) migrated from {path}.")
+
+
+class _Transaction:
+    """Immediate transaction context manager."""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+
+
+def open_storage(
+    logger: logger, configuration: StorageConfiguration
+) -> Storage:
+    """Open the job store of the configuration.
+
+    Args:
+        logger: Instance of logger.
+        configuration: Storage configuration.
+
+    Returns:
+        Job store.
+    """
+    if configuration.backend == "tinydb":
+        return TinyDBStorage(configuration.path or "db.json")
+
+    storage = SQLiteStorage(
+        configuration.path or "db.sqlite3", configuration.journal_mode
+    )
+    storage.migrate(logger, configuration.migrate_from)
+    return storage
@@ -1,52 +1,73 @@
 # Standard Library
+import json
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from time import sleep
-
-# Third Party
-from tinydb import Query
+from functools import partial
+from threading import Lock
 
 # First Party
-from overloaadd import db, overseerr, transmission, xthor
+from overloaadd import (
+    get_cache,
+    get_configuration,
+    get_db,
+    get_overseerr,
+    get_transmission,
+    get_xthor,
+)
 from overloaadd.dataclasses import Torrent
+from overloaadd.helpers import notify_encoder
 from overloaadd.logger import logger
+from overloaadd.server import Server
 
+# Overseerr notifications of a request ready to be searched.
+WEBHOOK_NOTIFICATIONS = ("MEDIA_APPROVED", "MEDIA_AUTO_APPROVED")
 
-def entrypoint() -> None:
-    """Watcher entrypoint."""
-    requests = overseerr.get_movie_requests()
+# Cache keys of the incremental request polling.
+WATERMARK_KEY = "watcher:requests:updated_at"
+FULL_SCAN_KEY = "watcher:requests:full_scan"
+WATERMARK_TTL = 30 * 86400
 
-    for request in requests:
-        # Get movie details.
-        tmdb_id = request.get("media", {}).get("tmdbId")
-        movie = overseerr.get_movie_details(tmdb_id)
-        title = movie.get("originalTitle") or movie.get("title")
-        try:
-            release_date = datetime.strptime(
-                movie.get("releaseDate"), "%Y-%m-%d"
-            )
-        except (ValueError, TypeError):
-            release_date = None
-        current_date_with_delta = datetime.now() + timedelta(days=7)
+# Movies being searched or added, to avoid adding duplicate torrents.
+in_progress = set()
+in_progress_lock = Lock()
+
+
+def process(tmdb_id: int) -> None:
+    """Process a movie request."""
+    configuration = get_configuration()
+    # Get movie details.
+    movie = get_overseerr().get_movie_details(tmdb_id)
+    title = movie.get("originalTitle") or movie.get("title")
+    try:
+        release_date = datetime.strptime(movie.get("releaseDate"), "%Y-%m-%d")
+    except (ValueError, TypeError):
+        release_date = None
+    current_date_with_delta = datetime.now() + timedelta(days=7)
+
+    # Check if movie is released.
+    if release_date is None or release_date > current_date_with_delta:
+        logger.debug(f"Movie {title} is not released yet.")
+        return
 
-        # Check if movie is released.
-        if release_date is None or release_date > current_date_with_delta:
-            logger.debug(f"Movie {title} is not released yet.")
-            continue
+    with in_progress_lock:
+        if tmdb_id in in_progress:
+            logger.debug(f"Request already being processed: {title}.")
+            return
+        in_progress.add(tmdb_id)
 
-        TorrentQuery = Query()
+    try:
         # Check if request is already in database.
-        if db.table("torrents").search(TorrentQuery.tmdb_id == tmdb_id):
+        if get_db().exists(tmdb_id):
             logger.debug(f"Request already in database: {title}.")
-            continue
+            return
 
         # Search for torrent.
-        sleep(2.5)
-        if (torrent_link := xthor.search_movie(tmdb_id, title)) is None:
+        if (torrent_link := get_xthor().search_movie(tmdb_id, title)) is None:
             logger.warning(f"No torrent found for {title}.")
-            continue
+            return
 
         # Add torrent to Transmission.
-        if torrent := transmission.add_torrent(torrent_link):
+        if torrent := get_transmission().add_torrent(torrent_link):
             logger.info(f"Torrent added: {torrent}")
 
             torrent = Torrent(
@@ -56,10 +77,144 @@ def entrypoint() -> None:
                 year=release_date.year,
             )
 
-            db.table("torrents").insert(torrent.model_dump())
+            get_db().insert(torrent)
+            get_db().append_event(torrent.torrent_id, "queued")
 
             logger.info(f"Torrent added to database: {torrent}")
+
+            if configuration.events.enabled:
+                notify_encoder(
+                    logger,
+                    configuration.events.url,
+                    configuration.events.token,
+                )
         else:
             logger.error(f"Failed to add torrent: {torrent_link}")
+    finally:
+        with in_progress_lock:
+            in_progress.discard(tmdb_id)
+
+
+def log_failure(tmdb_id: int, future: Future) -> None:
+    """Log the failure of a request processed in the background."""
+    if exc := future.exception():
+        logger.error(f"Failed to process request {tmdb_id}: {exc}")
+
+
+def listen() -> None:
+    """Listen for the Overseerr webhook notifications."""
+    configuration = get_configuration()
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, configuration.watcher.workers)
+    )
+
+    def webhook(body: bytes) -> tuple[int, str]:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, "Invalid JSON payload."
+
+        notification_type = payload.get("notification_type")
+        media = payload.get("media") or {}
+        if (
+            notification_type not in WEBHOOK_NOTIFICATIONS
+            or media.get("media_type") != "movie"
+        ):
+            logger.debug(f"Ignoring {notification_type} notification.")
+            return 200, "Ignored."
+
+        try:
+            tmdb_id = int(media.get("tmdbId"))
+        except (TypeError, ValueError):
+            return 400, "Invalid TMDB ID."
+
+        logger.info(f"{notification_type} notification for {tmdb_id}.")
+        executor.submit(process, tmdb_id).add_done_callback(
+            partial(log_failure, tmdb_id)
+        )
+        return 202, "Accepted."
+
+    server = Server(
+        logger,
+        configuration.webhook.host,
+        configuration.webhook.port,
+        configuration.webhook.token,
+    )
+    server.route("POST", "/webhook", webhook)
+    server.start()
+
+
+def poll_requests(executor: ThreadPoolExecutor) -> dict[Future, int]:
+    """Process the movie requests, page by page.
+
+    In incremental mode only the requests modified since the previous poll
+    are retrieved, a full scan is still done every full_scan_interval to
+    retry the movies that were not released or not found. The watermark is
+    saved once the requests are processed, at the oldest failed request so
+    that it is retried at the next poll.
+
+    Args:
+        executor: Executor processing the requests.
+
+    Returns:
+        Futures of the processed requests, with their TMDB ID.
+    """
+    configuration = get_configuration()
+    has_watermark, watermark = get_cache().lookup(WATERMARK_KEY)
+    full_scan = (
+        not configuration.watcher.incremental
+        or not has_watermark
+        or not get_cache().lookup(FULL_SCAN_KEY)[0]
+    )
+    if full_scan:
+        logger.info("Polling all the movie requests.")
+
+    futures = {}
+    # Oldest modification date of the requests of each movie.
+    updated = {}
+    newest = watermark
+    for request in get_overseerr().iter_movie_requests(
+        page_size=configuration.watcher.page_size,
+        sort="modified",
+        updated_since=None if full_scan else watermark,
+    ):
+        updated_at = request.get("updatedAt", "")
+        if newest is None or updated_at > newest:
+            newest = updated_at
+        tmdb_id = request.get("media", {}).get("tmdbId")
+        if tmdb_id not in updated:
+            futures[executor.submit(process, tmdb_id)] = tmdb_id
+            updated[tmdb_id] = updated_at
+        updated[tmdb_id] = min(updated[tmdb_id], updated_at)
+
+    wait(futures)
+    if failed := [
+        updated[tmdb_id]
+        for future, tmdb_id in futures.items()
+        if future.exception()
+    ]:
+        newest = min(failed)
+    if newest:
+        get_cache().set(WATERMARK_KEY, newest, WATERMARK_TTL)
+    if full_scan:
+        get_cache().set(
+            FULL_SCAN_KEY, True, configuration.watcher.full_scan_interval
+        )
+    return futures
+
+
+def entrypoint() -> None:
+    """Watcher entrypoint."""
+    configuration = get_configuration()
+    get_cache().purge(configuration.cache.negative_max_ttl)
+
+    # Upstream quotas are enforced by the rate limiters of the handlers.
+    with ThreadPoolExecutor(
+        max_workers=max(1, configuration.watcher.workers)
+    ) as executor:
+        futures = poll_requests(executor)
+
+    for future, tmdb_id in futures.items():
+        log_failure(tmdb_id, future)
 
-    logger.info("Watcher finished.")
+    logger.info(f"Watcher finished, {len(futures)} request(s) processed.")
@@ -0,0 +1,52 @@
+# Standard Library
+from threading import Thread
+
+# Third Party
+from loguru import logger
+
+# First Party
+from overloaadd.pipeline import Pipeline, Stage
+
+
+def fail(job: int) -> int:
+    raise ValueError(job)
+
+
+def test_run():
+    done = []
+    Pipeline(
+        logger,
+        [Stage("double", lambda job: job * 2, 2), Stage("done", done.append)],
+        1,
+    ).run(range(5))
+
+    assert sorted(done) == [0, 2, 4, 6, 8]
+
+
+def test_run_on_error():
+    failed = []
+    Pipeline(
+        logger,
+        [Stage("fail", fail), Stage("done", lambda job: job)],
+        1,
+        lambda job, exc: failed.append(job),
+    ).run(range(3))
+
+    assert failed == [0, 1, 2]
+
+
+def test_run_on_error_fails():
+    def on_error(job: int, exc: Exception) -> None:
+        raise RuntimeError(job)
+
+    pipeline = Pipeline(
+        logger,
+        [Stage("fail", fail), Stage("done", lambda job: job)],
+        1,
+        on_error,
+    )
+    thread = Thread(target=pipeline.run, args=(range(3),), daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive()
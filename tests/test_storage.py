@@ -0,0 +1,123 @@
+# Standard Library
+from time import time
+
+# Third Party
+import pytest
+
+# First Party
+from overloaadd.dataclasses import Torrent
+from overloaadd.storage import SQLiteStorage, Storage, TinyDBStorage
+
+TORRENT_ID = 1
+DURATION = 60
+
+
+@pytest.fixture(params=["sqlite", "tinydb"])
+def storage(request, tmp_path) -> Storage:
+    if request.param == "sqlite":
+        storage = SQLiteStorage(str(tmp_path / "db.sqlite"))
+    else:
+        storage = TinyDBStorage(str(tmp_path / "db.json"))
+    storage.insert(
+        Torrent(torrent_id=TORRENT_ID, tmdb_id=2, title="Title", year=2000)
+    )
+    return storage
+
+
+def test_claim(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+
+    row = storage.get(TORRENT_ID)
+    assert row["status"] == Torrent.TorrentStatus.ENCODING.value
+    assert row["lease_owner"] == "a"
+    assert row["attempts"] == 1
+    # Leased to another encoder.
+    assert not storage.claim(TORRENT_ID, "b", DURATION)
+
+
+def test_claim_expired(storage):
+    assert storage.claim(TORRENT_ID, "a", -1)
+    assert storage.claim(TORRENT_ID, "b", DURATION)
+
+    row = storage.get(TORRENT_ID)
+    assert row["lease_owner"] == "b"
+    assert row["attempts"] == 2
+    # Lost to the other encoder.
+    assert not storage.heartbeat(TORRENT_ID, "a", DURATION)
+    assert not storage.release(TORRENT_ID, "a")
+
+
+def test_heartbeat(storage):
+    assert storage.claim(TORRENT_ID, "a", -1)
+    assert storage.heartbeat(TORRENT_ID, "a", DURATION)
+
+    assert storage.get(TORRENT_ID)["lease_expires"] > 0
+    assert not storage.claim(TORRENT_ID, "b", DURATION)
+    assert not storage.heartbeat(TORRENT_ID, "b", DURATION)
+
+
+def test_release(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+    assert storage.release(TORRENT_ID, "a", Torrent.TorrentStatus.DONE)
+
+    row = storage.get(TORRENT_ID)
+    assert row["status"] == Torrent.TorrentStatus.DONE.value
+    assert row["lease_owner"] is None
+    assert row["lease_expires"] is None
+    assert not storage.release(TORRENT_ID, "a")
+    assert not storage.claim(TORRENT_ID, "a", DURATION)
+
+
+def test_release_status_unchanged(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+    assert storage.release(TORRENT_ID, "a")
+
+    row = storage.get(TORRENT_ID)
+    assert row["status"] == Torrent.TorrentStatus.ENCODING.value
+    # Released leases can be claimed again.
+    assert storage.claim(TORRENT_ID, "b", DURATION)
+    assert storage.get(TORRENT_ID)["attempts"] == 2
+
+
+def test_recover(storage):
+    assert storage.claim(TORRENT_ID, "a", -1)
+    assert storage.recover(2) == 0
+    assert storage.get(TORRENT_ID)["status"] == (
+        Torrent.TorrentStatus.ENCODING.value
+    )
+
+    assert storage.claim(TORRENT_ID, "b", -1)
+    assert storage.recover(2) == 1
+
+    row = storage.get(TORRENT_ID)
+    assert row["status"] == Torrent.TorrentStatus.FAILED.value
+    assert row["lease_owner"] is None
+    assert not storage.claim(TORRENT_ID, "a", DURATION)
+
+
+def test_recover_leased(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+
+    assert storage.recover(1) == 0
+    assert storage.get(TORRENT_ID)["lease_owner"] == "a"
+
+
+def test_release_backoff(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+    assert storage.release(TORRENT_ID, "a", backoff=DURATION)
+
+    row = storage.get(TORRENT_ID)
+    assert row["status"] == Torrent.TorrentStatus.ENCODING.value
+    assert row["lease_owner"] is None
+    # Doubled on every attempt.
+    assert row["lease_expires"] > time() + DURATION
+    assert not storage.claim(TORRENT_ID, "b", DURATION)
+    assert storage.recover(1) == 0
+
+
+def test_release_backoff_expired(storage):
+    assert storage.claim(TORRENT_ID, "a", DURATION)
+    assert storage.release(TORRENT_ID, "a", backoff=-DURATION)
+
+    assert storage.claim(TORRENT_ID, "b", DURATION)
+    assert storage.get(TORRENT_ID)["attempts"] == 2